@@ -1,4 +1,6 @@
 #!/usr/bin/python3
+import queue
+import threading
 import time
 import usb.core
 import usb.util
@@ -20,8 +22,47 @@ LED_GEAR_IDS = [35, 36, 37, 38, 39, 40, 41]
 LED_ALL_IDS = LED_BUTTON_IDS + LED_GEAR_IDS
 
 RAW_LED_DATA_LENGTH = 22
+MAX_INFLIGHT_WRITES = 4
 INTENSITY_MIN = 0x00
 INTENSITY_MAX = 0x0F
+FADE_IN = range(INTENSITY_MIN, INTENSITY_MAX + 1)
+FADE_OUT = range(INTENSITY_MAX, INTENSITY_MIN - 1, -1)
+
+
+def build_led_pos():
+    # Per-LED packing: (byte_pos, keep_mask, shift), None for unused/out-of-range ids.
+    # Odd ids live in the high nibble, even ids in the low nibble of byte `led_id // 2`.
+    table = [None] * (LED_ID_MAX + 1)
+    for led_id in range(LED_ID_MIN, LED_ID_MAX + 1):
+        if led_id in LED_ID_UNUSED:
+            continue
+        hex_pos = led_id & 1
+        table[led_id] = (led_id >> 1, 0x0F if hex_pos else 0xF0, 4 if hex_pos else 0)
+    return table
+
+
+LED_POS = build_led_pos()
+
+# Button LEDs 4-33 fill bytes 2-16 exactly, so set_all is a slice copy of a
+# pre-filled run; the gear nibbles in the bytes after it are left untouched.
+LED_BUTTON_BYTES = slice(LED_BUTTON_IDS[0] >> 1, (LED_BUTTON_IDS[-1] >> 1) + 1)
+LED_BUTTON_FILL = [
+    bytes([(intensity << 4) | intensity]) * (LED_BUTTON_BYTES.stop - LED_BUTTON_BYTES.start)
+    for intensity in range(INTENSITY_MIN, INTENSITY_MAX + 1)
+]
+
+
+def build_fade_frames(base, led_ids, intensities):
+    # Bake a fade into ready-to-send frames: each LED in turn steps through
+    # `intensities`, starting from (and accumulating onto) the `base` frame.
+    frame = bytearray(base)
+    frames = []
+    for led_id in led_ids:
+        byte_pos, keep_mask, shift = LED_POS[led_id]
+        for intensity in intensities:
+            frame[byte_pos] = (frame[byte_pos] & keep_mask) | (intensity << shift)
+            frames.append(bytes(frame))
+    return frames
 
 
 def clamp_intensity(value: int) -> int:
@@ -45,49 +86,96 @@ class LedMVP:
         self.dev.set_configuration()
         cfg = self.dev.get_active_configuration()
         self.ep_out = cfg[(INTERFACE, SETTING)][ENDPOINT_WRITER]
+        self._write = self.ep_out.write
         self.raw_led_data = bytearray(RAW_LED_DATA_LENGTH)
+        # pyusb transfers are synchronous, so frames are handed to a writer
+        # thread; the caller only blocks once MAX_INFLIGHT_WRITES are queued.
+        self._write_q = queue.Queue(maxsize=MAX_INFLIGHT_WRITES)
+        # Frames are copied into pooled buffers (queued + one being written),
+        # which the writer hands back once sent; nothing is allocated per frame.
+        # A failed write still returns its buffer; the error is re-raised by
+        # the next _send (or close) instead of killing the writer.
+        self._write_error = None
+        self._free = queue.SimpleQueue()
+        for _ in range(MAX_INFLIGHT_WRITES + 1):
+            self._free.put(bytearray(RAW_LED_DATA_LENGTH))
+        self._writer = threading.Thread(target=self._write_worker, name="led-writer", daemon=True)
+        self._writer.start()
+
+    def _write_worker(self):
+        while True:
+            frame = self._write_q.get()
+            if frame is None:
+                return
+            try:
+                self._write(frame)
+            except Exception as exc:
+                self._write_error = exc
+            finally:
+                self._free.put(frame)
+
+    def _raise_write_error(self):
+        error = self._write_error
+        if error is not None:
+            self._write_error = None
+            raise error
+
+    def _send(self, frame):
+        self._raise_write_error()
+        buf = self._free.get()
+        buf[:] = frame
+        self._write_q.put(buf)
 
     def write(self):
-        self.ep_out.write(self.raw_led_data)
+        self._send(self.raw_led_data)
+
+    def close(self):
+        """Flush queued frames and stop the writer thread; re-raises a pending write error."""
+        if self._writer.is_alive():
+            self._write_q.put(None)
+            self._writer.join()
+        self._raise_write_error()
 
     def set_led(self, led_id, intensity, send=True):
-        if led_id in LED_ID_UNUSED or led_id < LED_ID_MIN or led_id > LED_ID_MAX:
+        if led_id < 0 or led_id > LED_ID_MAX:
+            return
+        pos = LED_POS[led_id]
+        if pos is None:
             return
 
-        capped = clamp_intensity(intensity)
-        hex_pos = led_id % 2
-        byte_pos = (led_id - hex_pos) // 2
-
-        self.raw_led_data[byte_pos] &= 0x0F if hex_pos == 1 else 0xF0
-        self.raw_led_data[byte_pos] += capped * (0x10 if hex_pos == 1 else 0x01)
+        byte_pos, keep_mask, shift = pos
+        self.raw_led_data[byte_pos] = (self.raw_led_data[byte_pos] & keep_mask) | (clamp_intensity(intensity) << shift)
 
         if send:
             self.write()
 
     def set_all(self, intensity, send=True):
-        for led_id in LED_BUTTON_IDS:
-            self.set_led(led_id, intensity, send=False)
+        self.raw_led_data[LED_BUTTON_BYTES] = LED_BUTTON_FILL[clamp_intensity(intensity)]
         if send:
             self.write()
 
+    def play(self, frames, delay):
+        # Replay baked frames; the LED buffer is left holding the last one.
+        send = self._send
+        for frame in frames:
+            send(frame)
+            time.sleep(delay)
+        if frames:
+            self.raw_led_data[:] = frames[-1]
+
     def fade_in_order(self, led_ids, delay=0.03):
-        for led_id in led_ids:
-            for intensity in range(INTENSITY_MIN, INTENSITY_MAX + 1):
-                self.set_led(led_id, intensity, send=True)
-                time.sleep(delay)
+        self.play(build_fade_frames(self.raw_led_data, led_ids, FADE_IN), delay)
 
     def fade_out_order(self, led_ids, delay=0.03):
-        for led_id in led_ids:
-            for intensity in range(INTENSITY_MAX, INTENSITY_MIN - 1, -1):
-                self.set_led(led_id, intensity, send=True)
-                time.sleep(delay)
+        self.play(build_fade_frames(self.raw_led_data, led_ids, FADE_OUT), delay)
 
     def pulse_all(self, pulses=3, hold=0.15):
-        for _ in range(pulses):
-            self.set_all(INTENSITY_MAX, send=True)
-            time.sleep(hold)
-            self.set_all(INTENSITY_MIN, send=True)
-            time.sleep(hold)
+        # Pack both pulse frames once; each edge is then a plain buffer write.
+        self.set_all(INTENSITY_MAX, send=False)
+        frame_on = bytes(self.raw_led_data)
+        self.set_all(INTENSITY_MIN, send=False)
+        frame_off = bytes(self.raw_led_data)
+        self.play([frame_on, frame_off] * pulses, hold)
 
     def run_demo(self):
         self.set_all(INTENSITY_MIN, send=True)
@@ -99,7 +187,10 @@ class LedMVP:
 
 def main():
     demo = LedMVP()
-    demo.run_demo()
+    try:
+        demo.run_demo()
+    finally:
+        demo.close()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,61 @@
 #!/usr/bin/python3
 import sys
 import time
+import threading
+import queue
 import usb.core
 import usb.util
 import json
 from pathlib import Path
 import shutil
-from collections import deque
+import signal
+from functools import lru_cache
+from bisect import bisect_right
+from enum import IntEnum
+
+
+def build_axis_decoder(layout):
+    # Emit one straight-line function with the packet offsets baked in as literals.
+    terms = []
+    for _name, first_index, second_index, signed in layout:
+        raw10 = f"(((b[{first_index}] << 2) | (b[{second_index}] >> 6)) & 0x3FF)"
+        terms.append(f"({raw10} ^ 0x200) - 0x200" if signed else raw10)
+    source = "def decode_axes(b):\n    return (\n" + "".join(f"        {term},\n" for term in terms) + "    )\n"
+    namespace = {}
+    exec(compile(source, "<axis-decoder>", "exec"), namespace)
+    return namespace["decode_axes"]
+
+
+class LedMode(IntEnum):
+    OFF = 0
+    TOGGLE = 1
+    FLASH = 2
+
+
+LED_MODE_IDS = {"toggle": LedMode.TOGGLE, "flash": LedMode.FLASH}
+
+
+def parse_led_mode(value):
+    # config strings -> LedMode once at load; unknown names turn the LED off
+    if isinstance(value, LedMode):
+        return value
+    return LED_MODE_IDS.get(str(value).strip().lower(), LedMode.OFF)
+
+
+class _State:
+    __slots__ = (
+        "buttons",
+        "aim_x",
+        "aim_y",
+        "rotation",
+        "sight_x",
+        "sight_y",
+        "left_pedal",
+        "middle_pedal",
+        "right_pedal",
+        "tuner",
+        "gear",
+    )
 
 
 class SBCDriver:
@@ -27,6 +76,7 @@ class SBCDriver:
     GEAR_LED_NEUTRAL = 36
     GEAR_LED_FIRST = 37
     RAW_LED_DATA_LENGTH = 22
+    CONTROL_BUFFER_LENGTH = 32
     INTENSITY_MIN = 0x00
     INTENSITY_MAX = 0x0F
     LOWEST_LIGHT_VAL = 4
@@ -36,17 +86,61 @@ class SBCDriver:
     TIME_BETWEEN_POLLS_MS = 4
     FLASH_PERIOD_S = 0.3
     GEAR_REVERSE_FLASH = True
+    # (state field, first byte, second byte, signed) for each 10-bit axis, in _State order
+    AXIS_LAYOUT = (
+        ("aim_x", 9, 10, False),
+        ("aim_y", 11, 12, False),
+        ("rotation", 13, 14, True),
+        ("sight_x", 15, 16, True),
+        ("sight_y", 17, 18, True),
+        ("left_pedal", 19, 20, False),
+        ("middle_pedal", 21, 22, False),
+        ("right_pedal", 23, 24, False),
+    )
+    LED_MODE_OFF = LedMode.OFF
+    LED_MODE_TOGGLE = LedMode.TOGGLE
+    LED_MODE_FLASH = LedMode.FLASH
+    BUTTON_COUNT = 39
+    BUTTON_BITS_MASK = (1 << BUTTON_COUNT) - 1
+    # byte value -> its 8 button states (0/1), LSB first; a frame unpacks 5 bytes with no per-bit math
+    BYTE_BITS = tuple(bytes((value >> bit) & 1 for bit in range(8)) for value in range(256))
+    # per-button byte/mask, padded to 64 with zero masks so out-of-range indices read as released
+    BUTTON_BYTE = tuple(2 + (i >> 3) for i in range(BUTTON_COUNT)) + (2,) * (64 - BUTTON_COUNT)
+    BUTTON_MASK = tuple(1 << (i & 7) for i in range(BUTTON_COUNT)) + (0,) * (64 - BUTTON_COUNT)
 
     def __init__(self):
         self.dev = None
         self.ep_in = None
         self.ep_out = None
-        self.raw_led_data = bytearray(self.RAW_LED_DATA_LENGTH)
+        # set while the reader thread owns the USB device (start_reader/stop_reader)
+        self._reader = None
+        self._reader_running = False
+        self._reader_error = None
+        self._report_slot = [None]
+        self._report_ready = threading.Event()
+        self._led_queue = None
         self.raw_control_data = None
         self.prev_control_data = None
+        # parse_state copies each report into one of these two and swaps them with the previous
+        self._control_bufs = (bytearray(self.CONTROL_BUFFER_LENGTH), bytearray(self.CONTROL_BUFFER_LENGTH))
+        self._control_buf_idx = 0
+        # parse_state overwrites this one record and button array every poll
+        self._buttons_now = bytearray(40)
+        self._buttons_bits = 0
+        self._buttons_changed = 0
+        self._state = _State()
+        self._decode_axes = build_axis_decoder(self.AXIS_LAYOUT)
         self.update_gear_lights = True
         self.gear_light_intensity = 8
         self.led_state = {i: 0 for i in range(self.LED_ID_MIN, self.LED_ID_MAX + 1)}
+        # the whole LED frame as one int: led_id's intensity sits in the nibble at bit led_id * 4,
+        # so the little-endian bytes of this value are exactly raw_led_data
+        self._led_packed = 0
+        self._led_ids = [i for i in range(self.LED_ID_MIN, self.LED_ID_MAX + 1) if i not in self.LED_ID_UNUSED]
+        self._all_led_packed = [
+            sum(intensity << (led_id << 2) for led_id in self._led_ids)
+            for intensity in range(self.INTENSITY_MIN, self.INTENSITY_MAX + 1)
+        ]
         self._last_flash_toggle = time.monotonic()
         self._flash_on = False
         self.led_name_to_id = {
@@ -121,8 +215,12 @@ class SBCDriver:
             32: "Comm5",
         }
         self.led_modes = {}
+        self._button_led_plan = []
+        self._button_led_plan_default = None
         self.analog_config = {}
         self.analog_samples = {}
+        # (axis, trim, min, max, ring) per configured axis, coerced once in set_analog_config
+        self._analog_axes = []
         self.button_names = [
             "RightJoyMainWeapon",
             "RightJoyFire",
@@ -187,79 +285,156 @@ class SBCDriver:
             timeout=1000,
         )
 
+    def start_reader(self):
+        # Move USB I/O to its own thread: it keeps only the newest report in a one-item slot
+        # and sends pending LED frames between reads, so slow consumers never stall polling.
+        self._led_queue = queue.Queue(maxsize=1)
+        self._reader_error = None
+        self._reader_running = True
+        self._reader = threading.Thread(target=self._reader_loop, name="sbc-reader", daemon=True)
+        self._reader.start()
+
+    def stop_reader(self):
+        if self._reader is None:
+            return
+        self._reader_running = False
+        self._reader.join(timeout=2.0)
+        self._reader = None
+        pending = self._led_queue
+        self._led_queue = None
+        try:
+            self.ep_out.write(pending.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _reader_loop(self):
+        read_raw = self.read_raw
+        write = self.ep_out.write
+        slot = self._report_slot
+        ready = self._report_ready
+        leds = self._led_queue
+        while self._reader_running:
+            try:
+                slot[0] = read_raw()
+            except Exception as exc:
+                self._reader_error = exc
+                self._reader_running = False
+                ready.set()
+                return
+            ready.set()
+            try:
+                write(leds.get_nowait())
+            except queue.Empty:
+                pass
+
+    def next_report(self, timeout=None):
+        # Newest report from the reader thread; reports that arrived in between are dropped.
+        self._report_ready.wait(timeout)
+        self._report_ready.clear()
+        if self._reader_error is not None:
+            raise self._reader_error
+        return self._report_slot[0]
+
     @staticmethod
     def _axis_value(buf, first_index, second_index):
-        temp = int(buf[first_index]) << 2
-        temp2 = int(buf[second_index]) >> 6
+        temp = buf[first_index] << 2
+        temp2 = buf[second_index] >> 6
         return (temp | temp2) & 0x3FF
 
     @staticmethod
     def _signed_axis_value(buf, first_index, second_index):
-        temp = int(buf[first_index]) << 2
-        temp2 = int(buf[second_index]) >> 6
-        temp = (temp | temp2) & 0x3FF
-        if buf[first_index] >= 128:
-            temp |= 0xFC00
-        return temp - 0x10000 if temp & 0x8000 else temp
+        raw10 = ((buf[first_index] << 2) | (buf[second_index] >> 6)) & 0x3FF
+        return (raw10 ^ 0x200) - 0x200
 
-    @staticmethod
-    def _button_state(buf, button_index):
-        if button_index >= 39:
-            return False
-        byte_pos = 2 + (button_index // 8)
-        mask = 1 << (button_index % 8)
-        return (buf[byte_pos] & mask) != 0
+    def _button_state(self, buf, button_index):
+        return (buf[self.BUTTON_BYTE[button_index]] & self.BUTTON_MASK[button_index]) != 0
 
     def parse_state(self, buf):
+        self._control_buf_idx ^= 1
+        dst = self._control_bufs[self._control_buf_idx]
+        dst[:len(buf)] = buf
         self.prev_control_data = self.raw_control_data
-        self.raw_control_data = bytearray(buf)
-        raw_state = {
-            "buttons": [self._button_state(buf, i) for i in range(39)],
-            "aim_x": self._axis_value(buf, 9, 10),
-            "aim_y": self._axis_value(buf, 11, 12),
-            "rotation": self._signed_axis_value(buf, 13, 14),
-            "sight_x": self._signed_axis_value(buf, 15, 16),
-            "sight_y": self._signed_axis_value(buf, 17, 18),
-            "left_pedal": self._axis_value(buf, 19, 20),
-            "middle_pedal": self._axis_value(buf, 21, 22),
-            "right_pedal": self._axis_value(buf, 23, 24),
-            "tuner": int(buf[24]) & 0x0F,
-            "gear": int(buf[25]),
-        }
-        return self.apply_analog_processing(raw_state)
+        self.raw_control_data = dst
+        packed = int.from_bytes(buf[2:7], "little") & self.BUTTON_BITS_MASK
+        self._buttons_changed = packed ^ self._buttons_bits
+        self._buttons_bits = packed
+        buttons = self._buttons_now
+        bits = self.BYTE_BITS
+        buttons[0:8] = bits[buf[2]]
+        buttons[8:16] = bits[buf[3]]
+        buttons[16:24] = bits[buf[4]]
+        buttons[24:32] = bits[buf[5]]
+        buttons[32:40] = bits[buf[6]]
+        state = self._state
+        state.buttons = buttons
+        (
+            state.aim_x,
+            state.aim_y,
+            state.rotation,
+            state.sight_x,
+            state.sight_y,
+            state.left_pedal,
+            state.middle_pedal,
+            state.right_pedal,
+        ) = self._decode_axes(buf)
+        state.tuner = buf[24] & 0x0F
+        state.gear = buf[25]
+        return self.apply_analog_processing(state)
 
     def set_analog_config(self, config):
         self.analog_config = config
+        self._analog_axes = []
         for name, axis_cfg in config.items():
             samples = int(axis_cfg.get("smoothing_samples", 1))
             if samples < 1:
                 samples = 1
-            self.analog_samples[name] = deque(maxlen=samples)
-
-    def apply_analog_processing(self, state):
-        if not self.analog_config:
-            return state
-
-        for axis_name, axis_cfg in self.analog_config.items():
-            if axis_name not in state:
+            ring = self._new_smoother(samples)
+            if ring["n"] != samples:
+                print(f"analog {name}: smoothing_samples {samples} rounded up to {ring['n']} (must be a power of two)")
+            self.analog_samples[name] = ring
+            if name not in _State.__slots__:
                 continue
-
-            trim = int(axis_cfg.get("trim", 0))
-            value = state[axis_name] - trim
-
             minimum = axis_cfg.get("min")
             maximum = axis_cfg.get("max")
+            self._analog_axes.append(
+                (
+                    name,
+                    int(axis_cfg.get("trim", 0)),
+                    None if minimum is None else int(minimum),
+                    None if maximum is None else int(maximum),
+                    ring,
+                )
+            )
+
+    @staticmethod
+    def _new_smoother(samples):
+        # Fixed ring of the last `n` values plus their running sum, so averaging is O(1);
+        # `n` is rounded up to a power of two so a full ring averages with a shift.
+        n = 1 << (samples - 1).bit_length()
+        return {"buf": [0] * n, "idx": 0, "sum": 0, "filled": 0, "n": n, "shift": n.bit_length() - 1}
+
+    def apply_analog_processing(self, state):
+        for axis_name, trim, minimum, maximum, ring in self._analog_axes:
+            value = getattr(state, axis_name) - trim
             if minimum is not None and value < minimum:
                 value = minimum
             if maximum is not None and value > maximum:
                 value = maximum
 
-            samples = self.analog_samples.get(axis_name)
-            if samples is None:
-                samples = deque(maxlen=max(int(axis_cfg.get("smoothing_samples", 1)), 1))
-                self.analog_samples[axis_name] = samples
-            samples.append(value)
-            state[axis_name] = int(sum(samples) / len(samples))
+            idx = ring["idx"]
+            ring["sum"] += value - ring["buf"][idx]
+            ring["buf"][idx] = value
+            ring["idx"] = (idx + 1) % ring["n"]
+            if ring["filled"] < ring["n"]:
+                ring["filled"] += 1
+                setattr(state, axis_name, int(ring["sum"] / ring["filled"]))
+                continue
+            # shift, rounding toward zero like the divide above
+            total = ring["sum"]
+            if total < 0:
+                setattr(state, axis_name, -(-total >> ring["shift"]))
+            else:
+                setattr(state, axis_name, total >> ring["shift"])
 
         return state
 
@@ -270,31 +445,44 @@ class SBCDriver:
             return self.INTENSITY_MAX
         return value
 
+    @property
+    def raw_led_data(self):
+        return self._led_packed.to_bytes(self.RAW_LED_DATA_LENGTH, "little")
+
     def set_led(self, led_id, intensity, send=True):
         if led_id in self.LED_ID_UNUSED or led_id < self.LED_ID_MIN or led_id > self.LED_ID_MAX:
             return
 
         capped = self._clamp_intensity(intensity)
-        hex_pos = led_id % 2
-        byte_pos = (led_id - hex_pos) // 2
-
-        self.raw_led_data[byte_pos] &= 0x0F if hex_pos == 1 else 0xF0
-        self.raw_led_data[byte_pos] += capped * (0x10 if hex_pos == 1 else 0x01)
+        shift = led_id << 2
+        self._led_packed = (self._led_packed & ~(0xF << shift)) | (capped << shift)
         self.led_state[led_id] = capped
 
         if send:
             self.write_leds()
 
     def set_all_leds(self, intensity, send=True):
-        for led_id in range(self.LED_ID_MIN, self.LED_ID_MAX + 1):
-            if led_id in self.LED_ID_UNUSED:
-                continue
-            self.set_led(led_id, intensity, send=False)
+        capped = self._clamp_intensity(intensity)
+        self._led_packed = self._all_led_packed[capped]
+        self.led_state.update(dict.fromkeys(self._led_ids, capped))
         if send:
             self.write_leds()
 
     def write_leds(self):
-        self.ep_out.write(self.raw_led_data)
+        leds = self._led_queue
+        if leds is None:
+            self.ep_out.write(self.raw_led_data)
+            return
+        # only the newest frame matters; replace one the reader has not sent yet
+        frame = self.raw_led_data
+        try:
+            leds.put_nowait(frame)
+        except queue.Full:
+            try:
+                leds.get_nowait()
+            except queue.Empty:
+                pass
+            leds.put_nowait(frame)
 
     def update_gear_leds(self, gear_value, intensity=8):
         dirty = False
@@ -328,55 +516,73 @@ class SBCDriver:
         self.gear_light_intensity = self._clamp_intensity(intensity)
 
     def set_led_modes(self, modes):
-        self.led_modes = modes
+        self.led_modes = {name: parse_led_mode(mode) for name, mode in modes.items()}
+        self._button_led_plan_default = None
+
+    def _rebuild_button_led_plan(self, default_mode):
+        # (button bit mask, led_id, nibble shift, mode id) per mapped button; modes are fixed until config changes.
+        default_id = parse_led_mode(default_mode)
+        self._button_led_plan = [
+            (
+                1 << button_index,
+                self.led_name_to_id[led_name],
+                self.led_name_to_id[led_name] << 2,
+                self.led_modes.get(led_name, default_id),
+            )
+            for button_index, led_name in self.button_to_led_name.items()
+        ]
+        self._button_led_plan_default = default_mode
 
     def get_button_state(self, button_index):
         if self.raw_control_data is None:
             return False
-        return self._button_state(self.raw_control_data, button_index)
+        return bool((self._buttons_bits >> button_index) & 1)
 
     def button_changed(self, button_index):
         if self.raw_control_data is None or self.prev_control_data is None:
             return False
-        current = self._button_state(self.raw_control_data, button_index)
-        previous = self._button_state(self.prev_control_data, button_index)
-        return current != previous
+        return bool((self._buttons_changed >> button_index) & 1)
 
     def handle_button_leds(self, led_mode):
         if self.raw_control_data is None:
             return
 
-        dirty = False
         now = time.monotonic()
         if now - self._last_flash_toggle >= self.FLASH_PERIOD_S:
             self._flash_on = not self._flash_on
             self._last_flash_toggle = now
 
-        for button_index, led_name in self.button_to_led_name.items():
-            led_id = self.led_name_to_id[led_name]
-            mode = self.led_modes.get(led_name, led_mode)
-
-            if mode == "toggle":
-                if self.button_changed(button_index) and self.get_button_state(button_index):
+        if led_mode != self._button_led_plan_default:
+            self._rebuild_button_led_plan(led_mode)
+
+        # Work on a local copy of the packed frame; one int compare decides whether to write.
+        packed = self._led_packed
+        led_state = self.led_state
+        pressed_bits = self._buttons_bits
+        changed_bits = self._buttons_changed if self.prev_control_data is not None else 0
+        for mask, led_id, shift, mode in self._button_led_plan:
+            if mode == self.LED_MODE_TOGGLE:
+                if changed_bits & mask and pressed_bits & mask:
                     new_intensity = (
                         self.MIN_LIGHT_INTENSITY
-                        if self.led_state.get(led_id, 0) > 0
+                        if (packed >> shift) & 0xF
                         else self.MAX_LIGHT_INTENSITY
                     )
-                    self.set_led(led_id, new_intensity, send=False)
-                    dirty = True
+                    packed = (packed & ~(0xF << shift)) | (new_intensity << shift)
+                    led_state[led_id] = new_intensity
                 continue
 
-            if mode == "flash":
-                if self.get_button_state(button_index):
+            if mode == self.LED_MODE_FLASH:
+                if pressed_bits & mask:
                     intensity = self.MAX_LIGHT_INTENSITY if self._flash_on else self.MIN_LIGHT_INTENSITY
                 else:
                     intensity = self.MIN_LIGHT_INTENSITY
-                if self.led_state.get(led_id, 0) != intensity:
-                    self.set_led(led_id, intensity, send=False)
-                    dirty = True
+                if (packed >> shift) & 0xF != intensity:
+                    packed = (packed & ~(0xF << shift)) | (intensity << shift)
+                    led_state[led_id] = intensity
 
-        if dirty:
+        if packed != self._led_packed:
+            self._led_packed = packed
             self.write_leds()
 
     def demo_led_sequence(self):
@@ -432,18 +638,28 @@ def gear_label(value):
     return str(value)
 
 
-def format_state(state, sbc, width):
-    pressed = [name for i, name in enumerate(sbc.button_names) if state["buttons"][i]]
+@lru_cache(maxsize=8)
+def _format_header(width):
     header = "STEEL BATTALION CONTROLLER DIAGNOSTICS"
     title = header[:width].ljust(width)
     separator = "-" * min(width, len(title))
+    return title, separator
+
+
+def format_state(state, sbc, width):
+    return "\n".join(_format_state_lines(state, sbc, width))
+
+
+def _format_state_lines(state, sbc, width):
+    pressed = [name for i, name in enumerate(sbc.button_names) if state.buttons[i]]
+    title, separator = _format_header(width)
 
     axis_lines = [
-        f"Aim: X {state['aim_x']:>4}  Y {state['aim_y']:>4}",
-        f"Sight: X {state['sight_x']:>4}  Y {state['sight_y']:>4}",
-        f"Rotation: {state['rotation']:>5}",
-        f"Pedals: L {state['left_pedal']:>4}  M {state['middle_pedal']:>4}  R {state['right_pedal']:>4}",
-        f"Tuner: {state['tuner']:>2}  Gear: {gear_label(state['gear'])}",
+        f"Aim: X {state.aim_x:>4}  Y {state.aim_y:>4}",
+        f"Sight: X {state.sight_x:>4}  Y {state.sight_y:>4}",
+        f"Rotation: {state.rotation:>5}",
+        f"Pedals: L {state.left_pedal:>4}  M {state.middle_pedal:>4}  R {state.right_pedal:>4}",
+        f"Tuner: {state.tuner:>2}  Gear: {gear_label(state.gear)}",
     ]
 
     col_width = max(12, (width - 2) // 3)
@@ -468,15 +684,60 @@ def format_state(state, sbc, width):
         lines.extend(button_lines)
     else:
         lines.append("(none)")
-    return "\n".join(lines)
+    return lines
+
+
+# What is currently on screen, so each frame only rewrites the rows that changed.
+_screen = {"width": None, "lines": []}
+# terminal width, re-read on SIGWINCH; without that signal (Windows) it is re-read every N frames
+_term = {"width": shutil.get_terminal_size((80, 24)).columns, "frames": 0}
+TERM_WIDTH_REFRESH_FRAMES = 30
+
+
+def _refresh_term_width(*_):
+    _term["width"] = shutil.get_terminal_size((80, 24)).columns
+
+
+if hasattr(signal, "SIGWINCH"):
+    signal.signal(signal.SIGWINCH, _refresh_term_width)
 
 
 def render_state(state, sbc):
-    width = shutil.get_terminal_size((80, 24)).columns
-    text = format_state(state, sbc, width)
-    sys.stdout.write("\x1b[2J\x1b[H")
-    sys.stdout.write(text)
-    sys.stdout.flush()
+    if not hasattr(signal, "SIGWINCH"):
+        _term["frames"] += 1
+        if _term["frames"] >= TERM_WIDTH_REFRESH_FRAMES:
+            _term["frames"] = 0
+            _refresh_term_width()
+    width = _term["width"]
+    lines = _format_state_lines(state, sbc, width)
+    prev = _screen["lines"]
+    out = []
+    if width != _screen["width"]:
+        out.append("\x1b[2J")
+        prev = []
+    for row, line in enumerate(lines):
+        if row >= len(prev) or prev[row] != line:
+            out.append(f"\x1b[{row + 1};1H\x1b[2K{line}")
+    for row in range(len(lines), len(prev)):
+        out.append(f"\x1b[{row + 1};1H\x1b[2K")
+    _screen["width"] = width
+    _screen["lines"] = lines
+    if out:
+        _write_screen("".join(out))
+
+
+def _write_screen(text):
+    # One pre-encoded write straight to the byte buffer, skipping the text layer's encode and locking.
+    stream = sys.stdout
+    buffer = getattr(stream, "buffer", None)
+    if buffer is None:
+        stream.write(text)
+        stream.flush()
+        return
+    # anything print()ed since the last frame (macro log lines) must reach the terminal first
+    stream.flush()
+    buffer.write(text.encode("ascii", "ignore"))
+    buffer.flush()
 
 
 class MacroEngine:
@@ -486,6 +747,8 @@ class MacroEngine:
         self.macros = config.get("macros", {})
         self.analog_zones = config.get("analog_zones", {})
         self.gear_zones = config.get("gear_zones", [])
+        self._axis_zones = {axis: self._compile_analog_zones(zones) for axis, zones in self.analog_zones.items()}
+        self._gear_lookup = self._compile_gear_zones(self.gear_zones)
         self.output_mode = str(config.get("macro_output", "log")).lower()
         self.active_keys = set()
         self.axis_active = {}
@@ -509,6 +772,33 @@ class MacroEngine:
         if self.ui is None:
             self.output_mode = "log"
 
+    @staticmethod
+    def _compile_analog_zones(zones):
+        # (mins, zones, disjoint): zones are (min, max, action, behavior) in config order;
+        # when disjoint they are sorted by min so the match can be found with bisect
+        compiled = tuple(
+            (zone.get("min"), zone.get("max"), zone.get("action"), zone.get("behavior", "hold"))
+            for zone in zones
+            if zone.get("min") is not None and zone.get("max") is not None
+        )
+        ordered = sorted(compiled, key=lambda zone: zone[0])
+        disjoint = all(ordered[i][1] < ordered[i + 1][0] for i in range(len(ordered) - 1))
+        if disjoint:
+            compiled = tuple(ordered)
+        return tuple(zone[0] for zone in compiled), compiled, disjoint
+
+    @staticmethod
+    def _compile_gear_zones(zones):
+        # gear value -> (action, behavior); the first zone listing a value wins, as in a scan
+        lookup = {}
+        for zone in zones:
+            values = zone.get("values")
+            if values is None:
+                values = () if zone.get("value") is None else (zone.get("value"),)
+            for value in values:
+                lookup.setdefault(value, (zone.get("action"), zone.get("behavior", "hold")))
+        return lookup
+
     def _collect_keys(self):
         keys = set()
         for macro in self.macros.values():
@@ -570,8 +860,10 @@ class MacroEngine:
             self._release_keys(keys)
 
     def _behavior_from_led(self, led_name, default_led_mode):
-        led_mode = self.sbc.led_modes.get(led_name, default_led_mode)
-        return "hold" if led_mode == "flash" else "tap"
+        led_mode = self.sbc.led_modes.get(led_name)
+        if led_mode is None:
+            led_mode = parse_led_mode(default_led_mode)
+        return "hold" if led_mode == LedMode.FLASH else "tap"
 
     def handle_buttons(self, state, default_led_mode):
         for control_name, mapping in self.control_macros.items():
@@ -616,22 +908,22 @@ class MacroEngine:
                     self._run_hold_release(macro)
 
     def handle_analogs(self, state):
-        for axis_name, zones in self.analog_zones.items():
-            value = state.get(axis_name)
+        for axis_name, (mins, zones, disjoint) in self._axis_zones.items():
+            value = getattr(state, axis_name, None)
             if value is None:
                 continue
 
             current_action = None
             current_behavior = "hold"
-            for zone in zones:
-                min_val = zone.get("min")
-                max_val = zone.get("max")
-                if min_val is None or max_val is None:
-                    continue
-                if min_val <= value <= max_val:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
+            if disjoint:
+                i = bisect_right(mins, value) - 1
+                if i >= 0 and value <= zones[i][1]:
+                    current_action, current_behavior = zones[i][2], zones[i][3]
+            else:
+                for min_val, max_val, action, behavior in zones:
+                    if min_val <= value <= max_val:
+                        current_action, current_behavior = action, behavior
+                        break
 
             prev_action, prev_behavior = self.axis_active.get(axis_name, (None, "hold"))
             if current_action == prev_action:
@@ -653,25 +945,11 @@ class MacroEngine:
             self.axis_active[axis_name] = (current_action, current_behavior)
 
     def handle_gears(self, state):
-        gear_value = state.get("gear")
+        gear_value = state.gear
         if gear_value is None:
             return
 
-        current_action = None
-        current_behavior = "hold"
-        for zone in self.gear_zones:
-            values = zone.get("values")
-            value = zone.get("value")
-            if values is not None:
-                if gear_value in values:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
-            elif value is not None:
-                if gear_value == value:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
+        current_action, current_behavior = self._gear_lookup.get(gear_value, (None, "hold"))
 
         prev_action, prev_behavior = self.gear_active or (None, "hold")
         if current_action == prev_action:
@@ -714,15 +992,16 @@ def main():
     sbc.GEAR_REVERSE_FLASH = bool(effective["gear_reverse_flash"])
     if isinstance(effective.get("analog"), dict):
         sbc.set_analog_config(effective["analog"])
-    led_mode = str(effective["led_mode"]).lower()
+    led_mode = parse_led_mode(effective["led_mode"])
     led_modes = build_default_led_modes(sbc.led_name_to_id)
     if isinstance(effective.get("led_modes"), dict):
+        canon = {}
+        for name in sbc.led_name_to_id:
+            canon.setdefault(name.lower(), name)
         for key, value in effective["led_modes"].items():
-            key_norm = str(key).strip().lower()
-            for name in sbc.led_name_to_id.keys():
-                if name.lower() == key_norm:
-                    led_modes[name] = str(value).strip().lower()
-                    break
+            name = canon.get(str(key).strip().lower())
+            if name is not None:
+                led_modes[name] = value
     sbc.set_led_modes(led_modes)
     sbc.open()
     macro_engine = MacroEngine(effective, sbc)
@@ -733,22 +1012,47 @@ def main():
 
     if mode == "read":
         sbc.demo_led_sequence()
-        while True:
-            buf = sbc.read_raw()
-            state = sbc.parse_state(buf)
-            sbc.handle_button_leds(led_mode)
-            macro_engine.handle_buttons(state, led_mode)
-            macro_engine.handle_analogs(state)
-            macro_engine.handle_gears(state)
-            if sbc.update_gear_lights:
-                gear_value = state["gear"]
-                if sbc.GEAR_REVERSE_FLASH and gear_value == -2:
-                    intensity = sbc.MAX_LIGHT_INTENSITY if sbc._flash_on else sbc.MIN_LIGHT_INTENSITY
-                    sbc.update_gear_leds(gear_value, intensity)
-                else:
-                    sbc.update_gear_leds(gear_value, sbc.gear_light_intensity)
-            render_state(state, sbc)
-            time.sleep(sbc.TIME_BETWEEN_POLLS_MS / 1000.0)
+        # bind everything the poll loop touches once; config does not change while it runs
+        next_report = sbc.next_report
+        parse_state = sbc.parse_state
+        handle_button_leds = sbc.handle_button_leds
+        handle_buttons = macro_engine.handle_buttons
+        handle_analogs = macro_engine.handle_analogs
+        handle_gears = macro_engine.handle_gears
+        update_gear_leds = sbc.update_gear_leds
+        update_gear_lights = sbc.update_gear_lights
+        reverse_flash = sbc.GEAR_REVERSE_FLASH
+        gear_light_intensity = sbc.gear_light_intensity
+        render = render_state
+        sleep = time.sleep
+        monotonic = time.monotonic
+        dt = sbc.TIME_BETWEEN_POLLS_MS / 1000.0
+        # polling, LEDs and macros run every poll; the screen only needs refreshing at display rate
+        render_period = 1.0 / 30.0
+        next_render = 0.0
+        # USB reads and LED writes happen on the reader thread from here on
+        sbc.start_reader()
+        try:
+            while True:
+                state = parse_state(next_report())
+                handle_button_leds(led_mode)
+                handle_buttons(state, led_mode)
+                handle_analogs(state)
+                handle_gears(state)
+                if update_gear_lights:
+                    gear_value = state.gear
+                    if reverse_flash and gear_value == -2:
+                        intensity = sbc.MAX_LIGHT_INTENSITY if sbc._flash_on else sbc.MIN_LIGHT_INTENSITY
+                        update_gear_leds(gear_value, intensity)
+                    else:
+                        update_gear_leds(gear_value, gear_light_intensity)
+                now = monotonic()
+                if now >= next_render:
+                    render(state, sbc)
+                    next_render = now + render_period
+                sleep(dt)
+        finally:
+            sbc.stop_reader()
 
 
 if __name__ == "__main__":
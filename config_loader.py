@@ -1,19 +1,28 @@
 import json
+from dataclasses import dataclass
 from pathlib import Path
 
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# I/O errors plus whatever the available parsers raise for malformed content.
+_READ_ERRORS = (OSError, ValueError) + ((msgspec.DecodeError,) if msgspec is not None else ())
+
 """Config loading/merging helpers for runtime and profile selection."""
 
+_MISSING = object()
 
-def load_config(path):
-    """
-    Load config JSON and apply root-level defaults.
 
-    Notes:
-    - If file is missing/invalid, defaults are returned.
-    - One-level nested dict defaults are merged (e.g. `net_server`, `vessel_model`).
-    - Profile-specific overlays are applied elsewhere (`build_effective_config`).
-    """
-    defaults = {
+def _default_config():
+    """Return a fresh root-level defaults dict; callers own (and may mutate) it."""
+    return {
         "led_mode": "toggle",
         "led_modes": {},
         "flash_period_s": 0.3,
@@ -36,6 +45,8 @@ def load_config(path):
         "powerup_macro": "powerup",
         "event_log_path": "sbc_events.log",
         "event_log_max_bytes": 131072,
+        "event_sink_flush_ms": 250,
+        "event_sink_flush_max": 64,
         "input_queue_size": 256,
         "net_server": {
             "enabled": False,
@@ -67,28 +78,78 @@ def load_config(path):
         "active_profile": "default",
         "profiles": {},
     }
+
+
+def _parse_json(raw):
+    """Parse config bytes with the fastest installed decoder (`msgspec`, `orjson`, then stdlib)."""
+    if msgspec is not None:
+        return msgspec.json.decode(raw, type=dict)
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def load_config(path):
+    """
+    Load config JSON and apply root-level defaults.
+
+    Notes:
+    - If file is missing/invalid, defaults are returned.
+    - One-level nested dict defaults are merged (e.g. `net_server`, `vessel_model`).
+    - Profile-specific overlays are applied elsewhere (`build_effective_config`).
+    """
+    defaults = _default_config()
     cfg_path = Path(path)
-    if not cfg_path.exists():
-        return defaults
     try:
-        data = json.loads(cfg_path.read_text())
-    except (OSError, json.JSONDecodeError):
+        data = _parse_json(cfg_path.read_bytes())
+    except _READ_ERRORS:
+        return defaults
+    if type(data) is not dict:
         return defaults
+    # `defaults` is private to this call, so its values move into `data` uncopied
     for key, value in defaults.items():
-        if key not in data:
+        existing = data.get(key, _MISSING)
+        if existing is _MISSING:
             data[key] = value
-            continue
-        if isinstance(value, dict) and isinstance(data[key], dict):
+        elif type(value) is dict and type(existing) is dict:
             for nested_key, nested_value in value.items():
-                if nested_key not in data[key]:
-                    data[key][nested_key] = nested_value
+                if nested_key not in existing:
+                    existing[nested_key] = nested_value
     return data
 
 
+_FLASH_NAMES = frozenset({"Eject", "CockpitHatch", "Ignition", "Start"})
+
+
 def build_default_led_modes(led_name_to_id):
     """Build per-control LED mode defaults for the active controller layout."""
-    defaults = {}
-    flash_names = {"Eject", "CockpitHatch", "Ignition", "Start"}
-    for name in led_name_to_id.keys():
-        defaults[name] = "flash" if name in flash_names else "toggle"
-    return defaults
+    return {name: ("flash" if name in _FLASH_NAMES else "toggle") for name in led_name_to_id}
+
+
+@dataclass(frozen=True)
+class GearEffectSettings:
+    """Immutable, typed gear effect timings resolved once from an effective config."""
+
+    __slots__ = (
+        "gear_r_blink_period_ms",
+        "gear_r_blink_on_ms",
+        "gear5_breathe_period_ms",
+        "gear5_breathe_min",
+        "gear5_breathe_max",
+    )
+    gear_r_blink_period_ms: int
+    gear_r_blink_on_ms: int
+    gear5_breathe_period_ms: int
+    gear5_breathe_min: int
+    gear5_breathe_max: int
+
+    @classmethod
+    def from_config(cls, config):
+        """Coerce the gear effect keys of `config`, falling back to root defaults."""
+        return cls(
+            gear_r_blink_period_ms=int(config.get("gear_r_blink_period_ms", 500)),
+            gear_r_blink_on_ms=int(config.get("gear_r_blink_on_ms", 250)),
+            gear5_breathe_period_ms=int(config.get("gear5_breathe_period_ms", 2000)),
+            gear5_breathe_min=int(config.get("gear5_breathe_min", 0)),
+            gear5_breathe_max=int(config.get("gear5_breathe_max", 15)),
+        )
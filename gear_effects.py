@@ -1,8 +1,33 @@
 import time
+from functools import lru_cache
+
+from config_loader import GearEffectSettings
 
 """Gear-specific LED behavior coordinator layered on top of macro LED effects."""
 
 
+BREATHE_LUT_SIZE = 256
+
+
+@lru_cache(maxsize=8)
+def breathe_lut(min_val, max_val):
+    """
+    Pre-bake one breathe cycle as `BREATHE_LUT_SIZE` intensities.
+
+    Uses the same triangle ramp as `MacroEngine.tick`, so the renderer can look
+    up `lut[int(phase / period * BREATHE_LUT_SIZE)]` instead of doing the math.
+    """
+    lut = []
+    for step in range(BREATHE_LUT_SIZE):
+        tri = 1 - abs(2 * (step / BREATHE_LUT_SIZE) - 1)
+        lut.append(int(min_val + (max_val - min_val) * tri))
+    return tuple(lut)
+
+
+def _noop(gear_value):
+    pass
+
+
 class GearEffectController:
     """
     Applies symbolic gear light effects:
@@ -11,58 +36,116 @@ class GearEffectController:
     - otherwise: static gear indicator LEDs
     """
 
+    __slots__ = ("sbc", "macro_engine", "config", "settings", "_active_effect", "_transitions")
+
+    # Effect payload shapes; copied and filled in when an effect is installed.
+    _BLINK_TEMPLATE = {
+        "type": "blink",
+        "start": 0.0,
+        "duration_ms": None,
+        "period_ms": 500,
+        "on_ms": 250,
+        "intensity": 15,
+    }
+    _BREATHE_TEMPLATE = {
+        "type": "breathe",
+        "start": 0.0,
+        "duration_ms": None,
+        "period_ms": 2000,
+        "min": 0,
+        "max": 15,
+    }
+
     def __init__(self, sbc, macro_engine, config):
         self.sbc = sbc
         self.macro_engine = macro_engine
-        self.config = config
         self._active_effect = None
+        self._transitions = self._build_transitions()
+        self.reconfigure(config)
+
+    def reconfigure(self, config):
+        """Adopt a new config, resolving effect timings once instead of per update."""
+        self.config = config
+        self.settings = GearEffectSettings.from_config(config)
 
     def update(self, gear_value):
         """Update gear lighting based on current parsed gear value."""
-        if self.sbc.GEAR_REVERSE_FLASH and gear_value == -2:
-            self.sbc.update_gear_leds(None, self.sbc.gear_light_intensity)
-            period = int(self.config.get("gear_r_blink_period_ms", 500))
-            on_ms = int(self.config.get("gear_r_blink_on_ms", 250))
-            self._apply_blink("GearR", period_ms=period, on_ms=on_ms)
-            return
-        if gear_value == 5:
-            self.sbc.update_gear_leds(None, self.sbc.gear_light_intensity)
-            period = int(self.config.get("gear5_breathe_period_ms", 2000))
-            min_val = int(self.config.get("gear5_breathe_min", 0))
-            max_val = int(self.config.get("gear5_breathe_max", 15))
-            self._apply_breathe("Gear5", period_ms=period, min_val=min_val, max_val=max_val)
-            return
+        if gear_value == -2 and self.sbc.GEAR_REVERSE_FLASH:
+            next_effect = "GearR"
+        elif gear_value == 5:
+            next_effect = "Gear5"
+        else:
+            next_effect = None
+        self._transitions[self._active_effect, next_effect](gear_value)
 
-        self._clear_effects()
+    def _build_transitions(self):
+        """Map every (active effect, wanted effect) pair to the single step that gets there."""
+        return {
+            (None, None): self._show_static,
+            ("GearR", None): self._leave_effect,
+            ("Gear5", None): self._leave_effect,
+            (None, "GearR"): self._enter_gear_r,
+            ("Gear5", "GearR"): self._enter_gear_r,
+            ("GearR", "GearR"): _noop,
+            (None, "Gear5"): self._enter_gear5,
+            ("GearR", "Gear5"): self._enter_gear5,
+            # re-entering refreshes the running breathe in place (see `_apply_breathe`)
+            ("Gear5", "Gear5"): self._enter_gear5,
+        }
+
+    def _show_static(self, gear_value):
         self.sbc.update_gear_leds(gear_value, self.sbc.gear_light_intensity)
 
-    def _apply_blink(self, led_name, period_ms=500, on_ms=250):
-        """Install blink effect payload into macro LED effect engine."""
-        self._set_effect(
-            led_name,
-            {
-                "type": "blink",
-                "start": time.monotonic(),
-                "duration_ms": None,
-                "period_ms": period_ms,
-                "on_ms": on_ms,
-                "intensity": 15,
-            },
+    def _leave_effect(self, gear_value):
+        self._clear_effects()
+        self._show_static(gear_value)
+
+    def _enter_gear_r(self, gear_value):
+        settings = self.settings
+        self._apply_blink("GearR", period_ms=settings.gear_r_blink_period_ms, on_ms=settings.gear_r_blink_on_ms)
+
+    def _enter_gear5(self, gear_value):
+        settings = self.settings
+        self._apply_breathe(
+            "Gear5",
+            period_ms=settings.gear5_breathe_period_ms,
+            min_val=settings.gear5_breathe_min,
+            max_val=settings.gear5_breathe_max,
         )
 
-    def _apply_breathe(self, led_name, period_ms=2000, min_val=0, max_val=15):
+    def _apply_blink(self, led_name, period_ms=500, on_ms=250, _mono=time.monotonic):
+        """Install blink effect payload into macro LED effect engine."""
+        if self._active_effect == led_name:
+            # already running: refresh timings in place, keeping its phase
+            effect = self.macro_engine.led_effects.get(led_name)
+            if effect is not None and effect["type"] == "blink":
+                effect["period_ms"] = period_ms
+                effect["on_ms"] = on_ms
+            return
+        effect = self._BLINK_TEMPLATE.copy()
+        effect["start"] = _mono()
+        effect["period_ms"] = period_ms
+        effect["on_ms"] = on_ms
+        self._set_effect(led_name, effect)
+
+    def _apply_breathe(self, led_name, period_ms=2000, min_val=0, max_val=15, _mono=time.monotonic):
         """Install breathe effect payload into macro LED effect engine."""
-        self._set_effect(
-            led_name,
-            {
-                "type": "breathe",
-                "start": time.monotonic(),
-                "duration_ms": None,
-                "period_ms": period_ms,
-                "min": min_val,
-                "max": max_val,
-            },
-        )
+        if self._active_effect == led_name:
+            effect = self.macro_engine.led_effects.get(led_name)
+            if effect is not None and effect["type"] == "breathe":
+                effect["period_ms"] = period_ms
+                if effect["min"] != min_val or effect["max"] != max_val:
+                    effect["min"] = min_val
+                    effect["max"] = max_val
+                    effect["lut"] = breathe_lut(min_val, max_val)
+            return
+        effect = self._BREATHE_TEMPLATE.copy()
+        effect["start"] = _mono()
+        effect["period_ms"] = period_ms
+        effect["min"] = min_val
+        effect["max"] = max_val
+        effect["lut"] = breathe_lut(min_val, max_val)
+        self._set_effect(led_name, effect)
 
     def _set_effect(self, led_name, effect):
         """Switch active gear effect to a single LED effect definition."""
@@ -74,7 +157,8 @@ class GearEffectController:
 
     def _clear_effects(self):
         """Clear only gear-owned effects, leaving other LED effects intact."""
-        for name in ("GearR", "Gear5"):
-            if name in self.macro_engine.led_effects:
-                self.macro_engine.led_effects.pop(name, None)
+        if self._active_effect is None:
+            return
+        # only one gear effect is ever installed at a time
+        self.macro_engine.led_effects.pop(self._active_effect, None)
         self._active_effect = None
@@ -1,5 +1,7 @@
+import array
+import queue
+import threading
 import time
-from collections import deque
 
 """
 Input event queue for synthetic control/macro orchestration.
@@ -12,69 +14,176 @@ This keeps automation behavior aligned with user-driven behavior paths.
 """
 
 
+# Event kinds as stored in the ring, and the per-kind dict shape handed to consumers.
+_KIND_BUTTON = 0
+_KIND_MACRO = 1
+_KIND_EVENT = 2
+_KIND_TYPES = ("button", "macro", "event")
+_KIND_NAME_KEYS = ("control", "macro", "name")
+# Shared payload for events queued without one; consumers treat payloads as read-only.
+_EMPTY_PAYLOAD = {}
+
+
+def _event_dict(kind, name, pressed, source, payload, timestamp_ms):
+    """Materialize one stored event in the dict shape consumers and sinks expect."""
+    if kind == _KIND_BUTTON:
+        return {
+            "type": "button",
+            "control": name,
+            "pressed": pressed,
+            "source": source,
+            "payload": payload,
+            "timestamp_ms": timestamp_ms,
+        }
+    return {
+        "type": _KIND_TYPES[kind],
+        _KIND_NAME_KEYS[kind]: name,
+        "source": source,
+        "payload": payload,
+        "timestamp_ms": timestamp_ms,
+    }
+
+
 class InputMatrix:
     """Bounded in-memory queue for automation events."""
 
+    __slots__ = (
+        "event_sink",
+        "_cap",
+        "_kinds",
+        "_pressed",
+        "_timestamps",
+        "_names",
+        "_sources",
+        "_payloads",
+        "_head",
+        "_size",
+        "_sink_q",
+        "_sink_thread",
+        "dropped_sink_events",
+    )
+
     def __init__(self, event_sink=None, max_events=256):
         self.event_sink = event_sink
-        self._events = deque(maxlen=max(1, int(max_events)))
+        # Fixed ring stored as parallel per-field arrays; when full the oldest event is
+        # overwritten. Event dicts are only built when a consumer drains them.
+        self._cap = max(1, int(max_events))
+        self._kinds = bytearray(self._cap)
+        self._pressed = bytearray(self._cap)
+        self._timestamps = array.array("q", bytes(8 * self._cap))
+        self._names = [None] * self._cap
+        self._sources = [None] * self._cap
+        self._payloads = [None] * self._cap
+        self._head = 0
+        self._size = 0
+        # Sink publication runs on a worker thread (started on first push) so a slow
+        # network sink never blocks producers; overflow beyond `max_events` is dropped.
+        self._sink_q = queue.SimpleQueue()
+        self._sink_thread = None
+        self.dropped_sink_events = 0
 
     def queue_button(self, control_name, pressed, source="automation", payload=None):
         """Queue a synthetic control edge (press/release) for macro routing."""
         if not control_name:
             return
         self._push(
-            {
-                "type": "button",
-                "control": str(control_name),
-                "pressed": bool(pressed),
-                "source": str(source),
-                "payload": payload or {},
-            }
+            _KIND_BUTTON,
+            str(control_name),
+            pressed,
+            source,
+            payload if payload is not None else _EMPTY_PAYLOAD,
         )
 
     def queue_macro(self, macro_name, source="automation", payload=None):
         """Queue a macro execution request by name."""
         if not macro_name:
             return
-        self._push(
-            {
-                "type": "macro",
-                "macro": str(macro_name),
-                "source": str(source),
-                "payload": payload or {},
-            }
-        )
+        self._push(_KIND_MACRO, str(macro_name), False, source, payload if payload is not None else _EMPTY_PAYLOAD)
 
     def queue_event(self, event_name, source="automation", payload=None):
         """Queue a generic telemetry/event marker."""
         if not event_name:
             return
-        self._push(
-            {
-                "type": "event",
-                "name": str(event_name),
-                "source": str(source),
-                "payload": payload or {},
-            }
-        )
+        self._push(_KIND_EVENT, str(event_name), False, source, payload if payload is not None else _EMPTY_PAYLOAD)
 
     def drain(self):
         """Return and clear all currently queued events."""
-        events = list(self._events)
-        self._events.clear()
+        events = []
+        self.drain_into(events.append)
         return events
 
+    def drain_into(self, fn, _event_dict=_event_dict, _bool=bool):
+        """
+        Pop every currently queued event and pass it to `fn`, oldest first.
+
+        Preferred over `drain` in a per-frame loop since no event list is
+        returned. Pending events are copied out and the ring is emptied before
+        `fn` runs, so events queued by `fn` itself stay queued for the next
+        drain and, even with a full ring, cannot overwrite ones still waiting
+        to be dispatched.
+        """
+        if not self._size:
+            return
+        cap = self._cap
+        head = self._head
+        kinds = self._kinds
+        pressed = self._pressed
+        timestamps = self._timestamps
+        names = self._names
+        sources = self._sources
+        payloads = self._payloads
+        records = []
+        for offset in range(self._size):
+            i = (head + offset) % cap
+            records.append((kinds[i], names[i], _bool(pressed[i]), sources[i], payloads[i], timestamps[i]))
+            # drained slots drop their references so caller payloads are not kept alive
+            names[i] = sources[i] = payloads[i] = None
+        self._head = 0
+        self._size = 0
+        for record in records:
+            fn(_event_dict(*record))
+
     def __len__(self):
-        return len(self._events)
+        return self._size
 
-    def _push(self, event):
-        """Internal append with timestamp and optional network publication."""
-        event = dict(event)
-        event.setdefault("timestamp_ms", int(time.time() * 1000))
-        self._events.append(event)
-        if self.event_sink is not None:
+    def close(self):
+        """Flush pending sink publications and stop the worker thread."""
+        if self._sink_thread is not None:
+            self._sink_q.put(None)
+            self._sink_thread.join()
+            self._sink_thread = None
+
+    def _sink_worker(self):
+        """Publish queued events to the sink until `close` posts the stop marker."""
+        while True:
+            record = self._sink_q.get()
+            if record is None:
+                return
             try:
-                self.event_sink.publish({"type": "input_queue", "event": event})
+                self.event_sink.publish({"type": "input_queue", "event": _event_dict(*record)})
             except Exception:
                 pass
+
+    def _push(self, kind, name, pressed, source, payload, _time_ns=time.time_ns):
+        """Internal append with timestamp and optional network publication."""
+        timestamp_ms = _time_ns() // 1_000_000
+        if self._size < self._cap:
+            i = (self._head + self._size) % self._cap
+            self._size += 1
+        else:
+            i = self._head
+            self._head = (i + 1) % self._cap
+        self._kinds[i] = kind
+        self._names[i] = name
+        self._pressed[i] = 1 if pressed else 0
+        self._sources[i] = source
+        self._payloads[i] = payload
+        self._timestamps[i] = timestamp_ms
+        if self.event_sink is not None:
+            if self._sink_thread is None:
+                self._sink_thread = threading.Thread(target=self._sink_worker, name="input-matrix-sink", daemon=True)
+                self._sink_thread.start()
+            if self._sink_q.qsize() >= self._cap:
+                self.dropped_sink_events += 1
+            else:
+                self._sink_q.put_nowait((kind, name, True if pressed else False, source, payload, timestamp_ms))
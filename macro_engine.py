@@ -1,9 +1,23 @@
 import time
 import ast
 import json
+import mmap
+import operator
+import os
+import queue
+import re
+import shutil
 import subprocess
+import sys
+import threading
+from bisect import bisect_right
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 """
 Macro dispatch engine.
 
@@ -15,41 +29,216 @@ Responsibilities:
 - publish macro/zone events and consume queued synthetic input events
 """
 
+_MISSING = object()
+_VAR_TOKEN_RE = re.compile(r"\{var:([^}]+)\}")
+
+# Comparison node name -> operator; see `MacroEngine._compile_compare`.
+_COMPARE_OPS = {
+    "Eq": operator.eq,
+    "NotEq": operator.ne,
+    "Gt": operator.gt,
+    "GtE": operator.ge,
+    "Lt": operator.lt,
+    "LtE": operator.le,
+}
+
+# Step keys and expression calls accepted by `validate_macros`.
+_ALLOWED_STEP_KEYS = frozenset(
+    {
+        "if",
+        "then",
+        "else",
+        "sleep_ms",
+        "set_layer",
+        "cycle_layer",
+        "set_var",
+        "run_macro",
+        "press",
+        "down",
+        "up",
+        "led_set",
+        "led_blink",
+        "led_breathe",
+        "sound_play",
+        "tts_say",
+        "queue_button",
+        "queue_macro",
+    }
+)
+_ALLOWED_CALLS = frozenset(
+    {
+        "pressed",
+        "toggle_on",
+        "logical_on",
+        "led_on",
+        "var",
+        "analog",
+        "value",
+        "time_ms",
+        "is_set",
+        "is_none",
+        "num",
+    }
+)
+
+
+def _hidden_startupinfo():
+    """STARTUPINFO that keeps a console child from flashing a window (None off Windows)."""
+    if os.name != "nt":
+        return None
+    info = subprocess.STARTUPINFO()
+    info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    info.wShowWindow = subprocess.SW_HIDE
+    return info
+
+
+def _to_num(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intern_tree(value):
+    """
+    Copy a JSON-shaped config value with every string interned.
+
+    Control, macro, LED and var names are dict keys on the hot path; interned
+    copies let those lookups hit on identity instead of comparing text.
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is dict:
+        return {_intern_tree(key): _intern_tree(item) for key, item in value.items()}
+    if type(value) is list:
+        return [_intern_tree(item) for item in value]
+    return value
+
+
+def _dumps_vars(payload):
+    """Encode persisted vars as compact JSON bytes (`orjson` when installed)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            # values orjson refuses (e.g. ints wider than 64 bits) still go through json
+            pass
+    return json.dumps(payload).encode("utf-8")
+
+
+def _loads_vars(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
 
 class MacroEngine:
     """Runtime macro orchestrator used by the main polling loop."""
 
+    PERSIST_FLUSH_INTERVAL_S = 0.5
+    LOG_FLUSH_INTERVAL_S = 1.0
+    LOG_FLUSH_BYTES = 8192
+    LOG_RETRY_S = 5.0
+    AUDIO_QUEUE_MAX = 8
+
     def __init__(self, config, sbc, ui=None, event_sink=None, input_matrix=None):
         """Initialize macro mappings, outputs, persistence, and optional backends."""
         self.sbc = sbc
         self.ui = ui
         self.event_sink = event_sink
         self.input_matrix = input_matrix
-        self.control_macros = config.get("control_macros", {})
-        self.macros = config.get("macros", {})
-        self.analog_zones = config.get("analog_zones", {})
-        self.gear_zones = config.get("gear_zones", [])
-        self.layer_cycle_button = config.get("layer_cycle_button", "LeftJoySightChange")
+        self.control_macros = _intern_tree(config.get("control_macros", {}))
+        self.macros = _intern_tree(config.get("macros", {}))
+        self.analog_zones = _intern_tree(config.get("analog_zones", {}))
+        self.gear_zones = _intern_tree(config.get("gear_zones", []))
+        self._axis_zones = {axis: self._compile_analog_zones(zones) for axis, zones in self.analog_zones.items()}
+        self._gear_lookup = self._compile_gear_zones(self.gear_zones)
+        self._build_control_table()
+        self.layer_cycle_button = _intern_tree(config.get("layer_cycle_button", "LeftJoySightChange"))
         self.output_mode = str(config.get("macro_output", "log")).lower()
-        self.active_keys = set()
+        # Held keys as a byte-per-slot mask; key names get a slot on first use
+        # and each key macro's slot tuple is resolved once (`_macro_key_slots`).
+        self._active_mask = bytearray(256)
+        self._key_slots = {}
+        self._key_names = []
+        self._macro_slots = {}
         self.axis_active = {}
         self.gear_active = None
+        self._gear_value = None
         self.layer = 0
         self.vars = {}
         self.led_effects = {}
+        # Eject blink shown by `_visual_fallback`; effects are only read while
+        # rendering, so one dict is re-armed instead of built per failure
+        self._eject_blink = {
+            "type": "blink",
+            "start": 0.0,
+            "duration_ms": 1500,
+            "period_ms": 300,
+            "on_ms": 150,
+            "intensity": 15,
+        }
+        self.next_effect_deadline = None
         self.persist_enabled = bool(config.get("persist_vars", False))
-        self.persist_names = set(config.get("persist_var_names", []))
+        self.persist_names = set(_intern_tree(config.get("persist_var_names", [])))
         self.persist_path = Path(config.get("persist_var_path", "macro_vars.json"))
+        self._persist_dirty = False
+        self._persist_last_flush = 0.0
         self.sound_enabled = bool(config.get("sound_enabled", True))
         self.sound_base_path = Path(config.get("sound_base_path", "sounds"))
+        self._sound_path_cache = {}
         self.tts_enabled = bool(config.get("tts_enabled", True))
         self.tts_voice = config.get("tts_voice")
         self.event_log_path = Path(config.get("event_log_path", "sbc_events.log"))
         self.event_log_max_bytes = int(config.get("event_log_max_bytes", 131072))
+        # encoded log lines waiting for `_flush_log`, and their total size
+        self._log_buf = []
+        self._log_bytes = 0
+        self._log_last_flush = 0.0
+        self._log_size = self._stat_log_size()
+        # append handle, opened on the first flush and kept until rotate/reload/close
+        self._log_fh = None
+        # after a failed write, lines are counted as dropped (not buffered)
+        # until `_log_retry_at`
+        self._log_ok = True
+        self._log_retry_at = 0.0
+        self.log_drops = 0
+        self.event_flush_ms = int(config.get("event_sink_flush_ms", 250))
+        self.event_flush_max = int(config.get("event_sink_flush_max", 64))
+        self._event_buf = []
+        self._event_flush_at = 0.0
         self.ui_device = None
         self.ecodes = None
+        self._key_code = {}
+        self._ev_key = None
+        self._ui_write = None
+        self._ui_syn = None
+        self._syn_pending = False
         self._sound_backend = None
+        # TTS state below is owned by the audio worker; other threads change it
+        # only through `_post_audio_control`
         self._tts_backend = None
+        self._tts_ready = False
+        self._tts_voice = None
+        # long-lived `espeak --stdin`, started and fed by the audio worker;
+        # the executable is resolved on PATH once
+        self._espeak_proc = None
+        self._espeak_argv = None
+        self._espeak = shutil.which("espeak") or "espeak"
+        self._espeak_si = _hidden_startupinfo()
+        # Sound/TTS calls block, so they run on a daemon worker; failures come
+        # back through `_audio_errors` and are reported from `tick()`.
+        self._audio_q = queue.Queue(maxsize=self.AUDIO_QUEUE_MAX)
+        self._audio_errors = queue.SimpleQueue()
+        self.audio_drops = 0
+        # reset/stop jobs run by the worker ahead of its next job; kept apart
+        # from `_audio_q` so drop-oldest never discards one
+        self._audio_ctl = queue.SimpleQueue()
+        self._audio_thread = None
+        # expr string -> compiled zero-arg callable (None when invalid);
+        # expressions are config-independent so this survives reload_config.
+        self._expr_cache = {}
+        self._expr_lookups = self._build_expr_lookups()
+        self._step_ops = self._build_step_ops()
+        self._macro_cache = {}
 
         if self.output_mode in ("auto", "uinput"):
             try:
@@ -59,6 +248,13 @@ class MacroEngine:
                     raise
             else:
                 self.ecodes = ecodes
+                # key name -> code, resolved once instead of a getattr per keypress
+                self._key_code = {
+                    name: code
+                    for name, code in vars(ecodes).items()
+                    if name.startswith(("KEY_", "BTN_")) and isinstance(code, int)
+                }
+                self._ev_key = ecodes.EV_KEY
                 all_keys = self._collect_keys()
                 if all_keys:
                     self.ui_device = UInput({ecodes.EV_KEY: all_keys}, name="sbc-macro")
@@ -66,78 +262,156 @@ class MacroEngine:
 
         if self.ui_device is None:
             self.output_mode = "log"
+        else:
+            # bound once; _emit_no_syn/_flush call these per key transition
+            self._ui_write = self.ui_device.write
+            self._ui_syn = self.ui_device.syn
         self._load_persisted_vars()
         self._init_sound()
         self._init_tts()
 
+    @staticmethod
+    def _compile_analog_zones(zones):
+        # (mins, zones, disjoint): zones are (min, max, action, behavior) in config order;
+        # when disjoint they are sorted by min so the match can be found with bisect
+        compiled = tuple(
+            (zone.get("min"), zone.get("max"), zone.get("action"), zone.get("behavior", "hold"))
+            for zone in zones
+            if zone.get("min") is not None and zone.get("max") is not None
+        )
+        ordered = sorted(compiled, key=lambda zone: zone[0])
+        disjoint = all(ordered[i][1] < ordered[i + 1][0] for i in range(len(ordered) - 1))
+        if disjoint:
+            compiled = tuple(ordered)
+        return tuple(zone[0] for zone in compiled), compiled, disjoint
+
+    @staticmethod
+    def _compile_gear_zones(zones):
+        # gear value -> (action, behavior); the first zone listing a value wins, as in a scan
+        lookup = {}
+        for zone in zones:
+            values = zone.get("values")
+            if values is None:
+                values = () if zone.get("value") is None else (zone.get("value"),)
+            for value in values:
+                lookup.setdefault(value, (zone.get("action"), zone.get("behavior", "hold")))
+        return lookup
+
     def _collect_keys(self):
         """Collect all key codes referenced by key-based macros for uinput setup."""
+        key_code = self._key_code
         keys = set()
         for macro in self.macros.values():
+            if not isinstance(macro, dict):
+                continue
             for key in macro.get("keys", []):
-                code = getattr(self.ecodes, key, None)
+                code = key_code.get(key)
                 if code is not None:
                     keys.add(code)
         return list(keys)
 
     def _emit(self, key_name, pressed):
-        """Emit key transition via uinput or fallback logger/UI status."""
-        if self.output_mode == "uinput" and self.ui_device and self.ecodes:
-            code = getattr(self.ecodes, key_name, None)
+        """Emit one key transition and sync it immediately."""
+        self._emit_no_syn(key_name, pressed)
+        self._flush()
+
+    def _flush(self):
+        """Send one SYN_REPORT for every key written since the last flush."""
+        if self._syn_pending:
+            self._syn_pending = False
+            self._ui_syn()
+
+    def _emit_no_syn(self, key_name, pressed):
+        """Emit key transition via uinput (unsynced) or fallback logger/UI status."""
+        if self._ui_write is not None:
+            code = self._key_code.get(key_name)
             if code is None:
                 return
-            self.ui_device.write(self.ecodes.EV_KEY, code, 1 if pressed else 0)
-            self.ui_device.syn()
-            self._publish_event({"type": "macro_key", "key": key_name, "state": "down" if pressed else "up"})
+            self._ui_write(self._ev_key, code, 1 if pressed else 0)
+            self._syn_pending = True
+            if self.event_sink is not None:
+                self._publish_event({"type": "macro_key", "key": key_name, "state": "down" if pressed else "up"})
             return
         state = "DOWN" if pressed else "UP"
         if self.ui is not None:
             self.ui.set_status(f"MACRO {state}: {key_name}")
         else:
             print(f"MACRO {state}: {key_name}")
-        self._publish_event({"type": "macro_key", "key": key_name, "state": "down" if pressed else "up"})
+        if self.event_sink is not None:
+            self._publish_event({"type": "macro_key", "key": key_name, "state": "down" if pressed else "up"})
+
+    def _key_slot(self, key):
+        slot = self._key_slots.get(key)
+        if slot is None:
+            slot = len(self._key_names)
+            self._key_slots[key] = slot
+            self._key_names.append(key)
+            if slot >= len(self._active_mask):
+                self._active_mask.extend(bytes(len(self._active_mask)))
+        return slot
 
-    def _press_keys(self, keys):
-        for key in keys:
-            if key not in self.active_keys:
-                self._emit(key, True)
-                self.active_keys.add(key)
+    def _macro_key_slots(self, macro):
+        """Resolve a key macro's `keys` to mask slots, once per macro object."""
+        entry = self._macro_slots.get(id(macro))
+        if entry is not None and entry[0] is macro:
+            return entry[1]
+        slots = tuple(self._key_slot(key) for key in macro.get("keys", []))
+        self._macro_slots[id(macro)] = (macro, slots)
+        return slots
 
-    def _release_keys(self, keys):
-        for key in keys:
-            if key in self.active_keys:
-                self._emit(key, False)
-                self.active_keys.remove(key)
+    def _press_keys(self, slots):
+        mask = self._active_mask
+        names = self._key_names
+        for slot in slots:
+            if not mask[slot]:
+                self._emit_no_syn(names[slot], True)
+                mask[slot] = 1
+        self._flush()
+
+    def _release_keys(self, slots):
+        mask = self._active_mask
+        names = self._key_names
+        for slot in slots:
+            if mask[slot]:
+                self._emit_no_syn(names[slot], False)
+                mask[slot] = 0
+        self._flush()
 
     def _resolve_macro(self, action_name):
         """Resolve action name to macro definition; supports direct KEY_* fallback."""
+        macro = self._macro_cache.get(action_name, _MISSING)
+        if macro is not _MISSING:
+            return macro
         if action_name in self.macros:
-            return self.macros[action_name]
-        if action_name.startswith("KEY_"):
-            return {"keys": [action_name], "press_ms": 20, "release_ms": 20}
-        return None
+            macro = self.macros[action_name]
+        elif action_name.startswith("KEY_"):
+            macro = {"keys": [action_name], "press_ms": 20, "release_ms": 20}
+        else:
+            macro = None
+        self._macro_cache[action_name] = macro
+        return macro
 
     def _run_tap(self, macro, press_ms=None, release_ms=None):
         """Execute a tap-style key macro (press, delay, release, delay)."""
-        keys = macro.get("keys", [])
-        if not keys:
+        slots = self._macro_key_slots(macro)
+        if not slots:
             return
         press_delay = int(press_ms if press_ms is not None else macro.get("press_ms", 20))
         release_delay = int(release_ms if release_ms is not None else macro.get("release_ms", 20))
-        self._press_keys(keys)
+        self._press_keys(slots)
         time.sleep(press_delay / 1000.0)
-        self._release_keys(keys)
+        self._release_keys(slots)
         time.sleep(release_delay / 1000.0)
 
     def _run_hold_press(self, macro):
-        keys = macro.get("keys", [])
-        if keys:
-            self._press_keys(keys)
+        slots = self._macro_key_slots(macro)
+        if slots:
+            self._press_keys(slots)
 
     def _run_hold_release(self, macro):
-        keys = macro.get("keys", [])
-        if keys:
-            self._release_keys(keys)
+        slots = self._macro_key_slots(macro)
+        if slots:
+            self._release_keys(slots)
 
     def _behavior_from_led(self, led_name, default_led_mode):
         """Infer tap/hold behavior from LED mode semantics."""
@@ -145,23 +419,54 @@ class MacroEngine:
         led_mode, _ = self.sbc._parse_led_mode(led_mode_raw)
         return "hold" if led_mode in ("flash", "momentary") else "tap"
 
-    def _resolve_control_action(self, control_name):
-        """Resolve control mapping shape (string/dict/layer list) for one control."""
-        mapping = self.control_macros.get(control_name)
-        if isinstance(mapping, str):
-            return mapping, "from_led", None, None
-        if isinstance(mapping, dict):
-            return (
-                mapping.get("action"),
-                mapping.get("behavior", "from_led"),
-                mapping.get("press_ms"),
-                mapping.get("release_ms"),
-            )
-        if isinstance(mapping, list):
-            index = self.layer % len(mapping) if mapping else 0
-            action_name = mapping[index] if mapping else None
-            return action_name, "from_led", None, None
-        return None, None, None, None
+    def _build_control_table(self):
+        """
+        Flatten `control_macros` into dispatch rows once per config load.
+
+        Row: (button_index, layers, action, behavior, press_ms, release_ms, led_name).
+        `layers` holds the per-layer action names of list mappings (resolved
+        against the current layer at dispatch), otherwise None.
+        """
+        self._control_rows = {}
+        self._control_table = []
+        for control_name, mapping in self.control_macros.items():
+            layers = None
+            action_name = None
+            press_ms = release_ms = None
+            behavior = "from_led"
+            if isinstance(mapping, str):
+                action_name = mapping
+            elif isinstance(mapping, dict):
+                action_name = mapping.get("action")
+                behavior = mapping.get("behavior", "from_led")
+                press_ms = mapping.get("press_ms")
+                release_ms = mapping.get("release_ms")
+            elif isinstance(mapping, list):
+                layers = tuple(mapping)
+            else:
+                continue
+            if behavior is None:
+                continue
+            index = self.sbc.button_name_to_index.get(control_name)
+            led_name = self.sbc.button_to_led_name.get(-1 if index is None else index, control_name)
+            row = (index, layers, action_name, behavior, press_ms, release_ms, led_name)
+            self._control_rows[control_name] = row
+            if index is not None:
+                self._control_table.append(row)
+
+    def _dispatch_control(self, row, pressed, changed, default_led_mode):
+        """Run one control's mapped action for an edge event."""
+        _, layers, action_name, behavior, press_ms, release_ms, led_name = row
+        if layers is not None:
+            action_name = layers[self.layer % len(layers)] if layers else None
+        if not action_name:
+            return
+        if behavior == "from_led":
+            behavior = self._behavior_from_led(led_name, default_led_mode)
+        macro = self._resolve_macro(action_name)
+        if macro is None:
+            return
+        self._dispatch_action(macro, behavior, changed, pressed, press_ms, release_ms)
 
     def _dispatch_action(self, macro, behavior, changed, pressed, press_ms=None, release_ms=None):
         """Run macro action for resolved behavior and edge direction."""
@@ -188,121 +493,103 @@ class MacroEngine:
 
     def handle_button_event(self, control_name, pressed, changed=True, default_led_mode="toggle"):
         """Dispatch one control edge event through configured macro mapping."""
-        action_name, behavior, press_ms, release_ms = self._resolve_control_action(control_name)
-        if not action_name or behavior is None:
-            return
-
-        led_name = self.sbc.button_to_led_name.get(
-            self.sbc.button_name_to_index.get(control_name, -1),
-            control_name,
-        )
-        if behavior == "from_led":
-            behavior = self._behavior_from_led(led_name, default_led_mode)
-
-        macro = self._resolve_macro(action_name)
-        if macro is None:
-            return
-        self._dispatch_action(macro, behavior, changed, pressed, press_ms, release_ms)
+        row = self._control_rows.get(control_name)
+        if row is not None:
+            self._dispatch_control(row, pressed, changed, default_led_mode)
 
     def handle_buttons(self, state, default_led_mode):
         """Process configured control mappings from physical button edge state."""
-        for control_name in self.control_macros.keys():
-            index = self.sbc.button_name_to_index.get(control_name)
-            if index is None:
-                continue
-
-            pressed = self.sbc.get_button_state(index)
-            changed = self.sbc.button_changed(index)
-            self.handle_button_event(control_name, pressed, changed, default_led_mode)
+        # Unchanged controls never dispatch, so only edges reach _dispatch_control.
+        sbc = self.sbc
+        for row in self._control_table:
+            index = row[0]
+            if sbc.button_changed(index):
+                self._dispatch_control(row, sbc.get_button_state(index), True, default_led_mode)
 
     def handle_analogs(self, state):
         """Apply analog zone transitions and run enter/exit behavior macros."""
-        for axis_name, zones in self.analog_zones.items():
+        axis_active = self.axis_active
+        resolve_macro = self._resolve_macro
+        publish_event = self._publish_event
+        # event payloads are only built when someone is listening
+        events = self.event_sink is not None
+        for axis_name, (mins, zones, disjoint) in self._axis_zones.items():
             value = state.get(axis_name)
             if value is None:
                 continue
 
             current_action = None
             current_behavior = "hold"
-            for zone in zones:
-                min_val = zone.get("min")
-                max_val = zone.get("max")
-                if min_val is None or max_val is None:
-                    continue
-                if min_val <= value <= max_val:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
+            if disjoint:
+                i = bisect_right(mins, value) - 1
+                if i >= 0 and value <= zones[i][1]:
+                    current_action, current_behavior = zones[i][2], zones[i][3]
+            else:
+                for min_val, max_val, action, behavior in zones:
+                    if min_val <= value <= max_val:
+                        current_action, current_behavior = action, behavior
+                        break
 
-            prev_action, prev_behavior = self.axis_active.get(axis_name, (None, "hold"))
+            prev_action, prev_behavior = axis_active.get(axis_name, (None, "hold"))
             if current_action == prev_action:
                 continue
 
             if prev_action:
-                prev_macro = self._resolve_macro(prev_action)
+                prev_macro = resolve_macro(prev_action)
                 if prev_macro and prev_behavior == "hold":
                     self._run_hold_release(prev_macro)
-                self._publish_event(
-                    {
-                        "type": "analog_zone",
-                        "axis": axis_name,
-                        "value": value,
-                        "action": prev_action,
-                        "behavior": prev_behavior,
-                        "state": "exit",
-                    }
-                )
+                if events:
+                    publish_event(
+                        {
+                            "type": "analog_zone",
+                            "axis": axis_name,
+                            "value": value,
+                            "action": prev_action,
+                            "behavior": prev_behavior,
+                            "state": "exit",
+                        }
+                    )
 
             if current_action:
-                macro = self._resolve_macro(current_action)
+                macro = resolve_macro(current_action)
                 if macro:
                     if current_behavior == "tap":
                         self._run_tap(macro)
                     else:
                         self._run_hold_press(macro)
-                self._publish_event(
-                    {
-                        "type": "analog_zone",
-                        "axis": axis_name,
-                        "value": value,
-                        "action": current_action,
-                        "behavior": current_behavior,
-                        "state": "enter",
-                    }
-                )
+                if events:
+                    publish_event(
+                        {
+                            "type": "analog_zone",
+                            "axis": axis_name,
+                            "value": value,
+                            "action": current_action,
+                            "behavior": current_behavior,
+                            "state": "enter",
+                        }
+                    )
 
-            self.axis_active[axis_name] = (current_action, current_behavior)
+            axis_active[axis_name] = (current_action, current_behavior)
 
     def handle_gears(self, state):
         """Apply gear zone transitions and run associated macros."""
         gear_value = state.get("gear")
-        if gear_value is None:
+        # only gear edges can change the zone; reload_config resets `_gear_value`
+        if gear_value is None or gear_value == self._gear_value:
             return
+        self._gear_value = gear_value
 
-        current_action = None
-        current_behavior = "hold"
-        for zone in self.gear_zones:
-            values = zone.get("values")
-            value = zone.get("value")
-            if values is not None:
-                if gear_value in values:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
-            elif value is not None:
-                if gear_value == value:
-                    current_action = zone.get("action")
-                    current_behavior = zone.get("behavior", "hold")
-                    break
-
+        entry = self._gear_lookup.get(gear_value, (None, "hold"))
+        current_action, current_behavior = entry
         prev_action, prev_behavior = self.gear_active or (None, "hold")
         if current_action == prev_action:
             return
 
-            if prev_action:
-                prev_macro = self._resolve_macro(prev_action)
-                if prev_macro and prev_behavior == "hold":
-                    self._run_hold_release(prev_macro)
+        if prev_action:
+            prev_macro = self._resolve_macro(prev_action)
+            if prev_macro and prev_behavior == "hold":
+                self._run_hold_release(prev_macro)
+            if self.event_sink is not None:
                 self._publish_event(
                     {
                         "type": "gear_zone",
@@ -313,13 +600,14 @@ class MacroEngine:
                     }
                 )
 
-            if current_action:
-                macro = self._resolve_macro(current_action)
-                if macro:
-                    if current_behavior == "tap":
-                        self._run_tap(macro)
-                    else:
-                        self._run_hold_press(macro)
+        if current_action:
+            macro = self._resolve_macro(current_action)
+            if macro:
+                if current_behavior == "tap":
+                    self._run_tap(macro)
+                else:
+                    self._run_hold_press(macro)
+            if self.event_sink is not None:
                 self._publish_event(
                     {
                         "type": "gear_zone",
@@ -330,7 +618,7 @@ class MacroEngine:
                     }
                 )
 
-        self.gear_active = (current_action, current_behavior)
+        self.gear_active = entry
 
     def handle_layer_cycle(self):
         """Advance control layer when configured layer-cycle button is pressed."""
@@ -348,30 +636,79 @@ class MacroEngine:
         return max_len
 
     def tick(self):
-        """Update active LED effects each frame."""
+        """
+        Update active LED effects each frame and flush buffered output.
+
+        Also refreshes `next_effect_deadline`: the monotonic time at which the
+        earliest timed effect expires (None when none is running), so a caller
+        with nothing else to do knows how long it may sleep.
+        """
+        if not self._audio_errors.empty():
+            self._report_audio_errors()
+        if self.led_effects:
+            self.next_effect_deadline = self._update_led_effects(self.led_effects)
+        else:
+            self.next_effect_deadline = None
+        self.flush_events()
+        if self._persist_dirty:
+            self._flush_persisted_vars()
+        if self._log_buf:
+            self._flush_log()
+
+    def _update_led_effects(self, effects):
+        """Render one frame of LED effects; returns the earliest expiry deadline."""
         now = time.monotonic()
-        to_remove = []
-        for led_name, effect in self.led_effects.items():
+        sbc = self.sbc
+        led_ids = sbc.led_name_to_id
+        led_state = sbc.led_state
+        # led_state holds clamped levels, so compare against the clamped value
+        lo = sbc.INTENSITY_MIN
+        hi = sbc.INTENSITY_MAX
+        expired = None
+        deadline = None
+        changes = None
+        for led_name, effect in effects.items():
+            elapsed = now - effect["start"]
             duration = effect.get("duration_ms")
-            if duration is not None and now - effect["start"] >= duration / 1000.0:
-                to_remove.append(led_name)
-                continue
+            if duration is not None:
+                end = effect["start"] + duration / 1000.0
+                if now >= end:
+                    if expired is None:
+                        expired = []
+                    expired.append(led_name)
+                    continue
+                if deadline is None or end < deadline:
+                    deadline = end
             if effect["type"] == "blink":
                 period = effect.get("period_ms", 500) / 1000.0
-                on_ms = effect.get("on_ms", 250) / 1000.0
-                phase = (now - effect["start"]) % period
-                intensity = effect["intensity"] if phase <= on_ms else 0
+                on_s = effect.get("on_ms", 250) / 1000.0
+                intensity = effect["intensity"] if elapsed % period <= on_s else 0
             else:
                 period = effect.get("period_ms", 2000) / 1000.0
-                phase = (now - effect["start"]) % period
-                cycle = (phase / period)
-                tri = 1 - abs(2 * cycle - 1)
-                intensity = int(effect["min"] + (effect["max"] - effect["min"]) * tri)
-            self.sbc.set_led(self.sbc.led_name_to_id[led_name], intensity, send=False)
-        if self.led_effects:
-            self.sbc.write_leds()
-        for name in to_remove:
-            self.led_effects.pop(name, None)
+                cycle = (elapsed % period) / period
+                lut = effect.get("lut")
+                if lut is not None:
+                    # pre-baked ramp (see gear_effects.breathe_lut): one index instead of the math
+                    intensity = lut[int(cycle * len(lut)) % len(lut)]
+                else:
+                    tri = 1 - abs(2 * cycle - 1)
+                    intensity = int(effect["min"] + (effect["max"] - effect["min"]) * tri)
+            if intensity > hi:
+                intensity = hi
+            elif intensity < lo:
+                intensity = lo
+            # Most frames leave every level unchanged; only send when one moved.
+            led_id = led_ids[led_name]
+            if led_state.get(led_id) != intensity:
+                if changes is None:
+                    changes = []
+                changes.append((led_id, intensity))
+        if changes:
+            sbc.set_leds(changes)
+        if expired:
+            for name in expired:
+                effects.pop(name, None)
+        return deadline
 
     def _run_steps(self, steps, context="tap"):
         """
@@ -379,202 +716,296 @@ class MacroEngine:
 
         Supported steps include conditionals, timing, vars, layered controls,
         key actions, LED effects, audio/TTS, and input queue operations.
+        Each step runs the handler for the first action key it lists.
         """
+        step_ops = self._step_ops
         for step in steps:
-            if "if" in step:
-                expr = step.get("if", "")
-                then = step.get("then", [])
-                otherwise = step.get("else", [])
-                if self._eval_expr(expr):
-                    self._run_steps(then, context=context)
-                else:
-                    self._run_steps(otherwise, context=context)
-                continue
-            if "sleep_ms" in step:
-                time.sleep(int(step["sleep_ms"]) / 1000.0)
-                continue
-            if "set_layer" in step:
-                self.layer = int(step["set_layer"])
-                continue
-            if "cycle_layer" in step:
-                self.layer = (self.layer + 1) % max(1, self._max_layers())
-                continue
-            if "set_var" in step:
-                payload = step["set_var"]
-                if isinstance(payload, dict):
-                    self.vars[payload.get("name")] = payload.get("value")
-                    self._save_persisted_vars()
-                continue
-            if "run_macro" in step:
-                self.run_macro(step["run_macro"])
-                continue
-            if "press" in step:
-                payload = step["press"]
-                key = payload.get("key")
-                hold_ms = int(payload.get("hold_ms", 20))
-                if key:
-                    self._emit(key, True)
-                    time.sleep(hold_ms / 1000.0)
-                    self._emit(key, False)
-                continue
-            if "down" in step:
-                key = step["down"]
-                self._emit(key, True)
-                continue
-            if "up" in step:
-                key = step["up"]
-                self._emit(key, False)
-                continue
-            if "led_set" in step:
-                payload = step["led_set"]
-                led = payload.get("led")
-                intensity = int(payload.get("intensity", 0))
-                if led in self.sbc.led_name_to_id:
-                    self.sbc.set_led(self.sbc.led_name_to_id[led], intensity, send=True)
-                continue
-            if "led_blink" in step:
-                payload = step["led_blink"]
-                led = payload.get("led")
-                if led in self.sbc.led_name_to_id:
-                    self.led_effects[led] = {
-                        "type": "blink",
-                        "start": time.monotonic(),
-                        "duration_ms": payload.get("duration_ms"),
-                        "period_ms": payload.get("period_ms", 500),
-                        "on_ms": payload.get("on_ms", 250),
-                        "intensity": int(payload.get("intensity", 15)),
-                    }
-                continue
-            if "led_breathe" in step:
-                payload = step["led_breathe"]
-                led = payload.get("led")
-                if led in self.sbc.led_name_to_id:
-                    self.led_effects[led] = {
-                        "type": "breathe",
-                        "start": time.monotonic(),
-                        "duration_ms": payload.get("duration_ms"),
-                        "period_ms": payload.get("period_ms", 2000),
-                        "min": int(payload.get("min", 0)),
-                        "max": int(payload.get("max", 15)),
-                    }
-                continue
-            if "sound_play" in step:
-                payload = step["sound_play"]
-                file_name = payload.get("file")
-                if file_name:
-                    self._sound_play(file_name)
-                continue
-            if "tts_say" in step:
-                payload = step["tts_say"]
-                text = payload.get("text")
-                if text:
-                    self._tts_say(self._format_text(text))
-                continue
-            if "queue_button" in step:
-                payload = step["queue_button"]
-                if isinstance(payload, dict) and self.input_matrix is not None:
-                    control_name = payload.get("control")
-                    pressed = bool(payload.get("pressed", True))
-                    self.input_matrix.queue_button(
-                        control_name,
-                        pressed,
-                        source="macro",
-                        payload={"context": context},
-                    )
-                continue
-            if "queue_macro" in step:
-                macro_name = step["queue_macro"]
-                if self.input_matrix is not None:
-                    self.input_matrix.queue_macro(
-                        macro_name,
-                        source="macro",
-                        payload={"context": context},
-                    )
+            for key in step:
+                op = step_ops.get(key)
+                if op is not None:
+                    break
+            else:
                 continue
+            # Runs of down/up steps share one SYN_REPORT; anything else
+            # (sleeps, nested macros, audio) sees the keys already synced.
+            if self._syn_pending and key != "down" and key != "up":
+                self._flush()
+            op(step, context)
+        self._flush()
+
+    def _build_step_ops(self):
+        """Map each scripted step action key to its handler."""
+        return {
+            "if": self._step_if,
+            "sleep_ms": self._step_sleep_ms,
+            "set_layer": self._step_set_layer,
+            "cycle_layer": self._step_cycle_layer,
+            "set_var": self._step_set_var,
+            "run_macro": self._step_run_macro,
+            "press": self._step_press,
+            "down": self._step_down,
+            "up": self._step_up,
+            "led_set": self._step_led_set,
+            "led_blink": self._step_led_blink,
+            "led_breathe": self._step_led_breathe,
+            "sound_play": self._step_sound_play,
+            "tts_say": self._step_tts_say,
+            "queue_button": self._step_queue_button,
+            "queue_macro": self._step_queue_macro,
+        }
+
+    def _step_if(self, step, context):
+        if self._eval_expr(step.get("if", "")):
+            self._run_steps(step.get("then", []), context=context)
+        else:
+            self._run_steps(step.get("else", []), context=context)
+
+    def _step_sleep_ms(self, step, context):
+        time.sleep(int(step["sleep_ms"]) / 1000.0)
+
+    def _step_set_layer(self, step, context):
+        self.layer = int(step["set_layer"])
+
+    def _step_cycle_layer(self, step, context):
+        self.layer = (self.layer + 1) % max(1, self._max_layers())
+
+    def _step_set_var(self, step, context):
+        payload = step["set_var"]
+        if isinstance(payload, dict):
+            name = payload.get("name")
+            if type(name) is str:
+                name = sys.intern(name)
+            self.vars[name] = payload.get("value")
+            if self.persist_enabled and name in self.persist_names:
+                self._persist_dirty = True
+
+    def _step_run_macro(self, step, context):
+        self.run_macro(step["run_macro"])
+
+    def _step_press(self, step, context):
+        payload = step["press"]
+        key = payload.get("key")
+        hold_ms = int(payload.get("hold_ms", 20))
+        if key:
+            self._emit(key, True)
+            time.sleep(hold_ms / 1000.0)
+            self._emit_no_syn(key, False)
+
+    def _step_down(self, step, context):
+        self._emit_no_syn(step["down"], True)
+
+    def _step_up(self, step, context):
+        self._emit_no_syn(step["up"], False)
+
+    def _step_led_set(self, step, context):
+        payload = step["led_set"]
+        led_id = self.sbc.led_name_to_id.get(payload.get("led"))
+        intensity = int(payload.get("intensity", 0))
+        if led_id is not None:
+            self.sbc.set_led(led_id, intensity, send=True)
+
+    def _step_led_blink(self, step, context):
+        payload = step["led_blink"]
+        led = payload.get("led")
+        if led in self.sbc.led_name_to_id:
+            self.led_effects[led] = {
+                "type": "blink",
+                "start": time.monotonic(),
+                "duration_ms": payload.get("duration_ms"),
+                "period_ms": payload.get("period_ms", 500),
+                "on_ms": payload.get("on_ms", 250),
+                "intensity": int(payload.get("intensity", 15)),
+            }
+
+    def _step_led_breathe(self, step, context):
+        payload = step["led_breathe"]
+        led = payload.get("led")
+        if led in self.sbc.led_name_to_id:
+            self.led_effects[led] = {
+                "type": "breathe",
+                "start": time.monotonic(),
+                "duration_ms": payload.get("duration_ms"),
+                "period_ms": payload.get("period_ms", 2000),
+                "min": int(payload.get("min", 0)),
+                "max": int(payload.get("max", 15)),
+            }
+
+    def _step_sound_play(self, step, context):
+        file_name = step["sound_play"].get("file")
+        if file_name:
+            self._sound_play(file_name)
+
+    def _step_tts_say(self, step, context):
+        text = step["tts_say"].get("text")
+        if text:
+            self._tts_say(self._format_text(text))
+
+    def _step_queue_button(self, step, context):
+        payload = step["queue_button"]
+        if isinstance(payload, dict) and self.input_matrix is not None:
+            self.input_matrix.queue_button(
+                payload.get("control"),
+                bool(payload.get("pressed", True)),
+                source="macro",
+                payload={"context": context},
+            )
+
+    def _step_queue_macro(self, step, context):
+        if self.input_matrix is not None:
+            self.input_matrix.queue_macro(
+                step["queue_macro"],
+                source="macro",
+                payload={"context": context},
+            )
 
     def _eval_expr(self, expr):
         """Safely evaluate constrained expression syntax for scripted conditions."""
-        try:
-            tree = ast.parse(expr, mode="eval")
-        except SyntaxError:
+        fn = self._expr_cache.get(expr, _MISSING)
+        if fn is _MISSING:
+            fn = self._compile_expr(expr)
+        if fn is None:
             return False
-        if not self._validate_expr_tree(tree.body):
-            return False
-        return self._eval_node(tree.body)
+        return fn()
 
-    def _eval_node(self, node):
-        """Evaluate validated expression AST nodes against runtime values."""
+    def _compile_expr(self, expr):
+        """Parse, validate and compile an expression once, caching the callable (or None)."""
+        try:
+            node = ast.parse(expr, mode="eval").body
+        except (SyntaxError, ValueError, TypeError):
+            node = None
+        fn = None
+        if node is not None and self._validate_expr_tree(node):
+            fn = self._compile_node(node)
+        self._expr_cache[expr] = fn
+        return fn
+
+    def _compile_node(self, node):
+        """
+        Turn a validated expression AST node into a zero-arg closure.
+
+        Constant call arguments are resolved here (button index, LED id,
+        `num` value) so evaluation does no name lookups or type checks.
+        """
         if isinstance(node, ast.BoolOp):
-            vals = [self._eval_node(v) for v in node.values]
+            fns = tuple(self._compile_node(v) for v in node.values)
             if isinstance(node.op, ast.And):
-                return all(vals)
-            if isinstance(node.op, ast.Or):
-                return any(vals)
+                if len(fns) == 2:
+                    first, second = fns
+                    return lambda: bool(first() and second())
+                return lambda: all(fn() for fn in fns)
+            if len(fns) == 2:
+                first, second = fns
+                return lambda: bool(first() or second())
+            return lambda: any(fn() for fn in fns)
         if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
-            return not self._eval_node(node.operand)
+            operand = self._compile_node(node.operand)
+            return lambda: not operand()
         if isinstance(node, ast.Compare):
-            left = self._eval_node(node.left)
-            for op, comp in zip(node.ops, node.comparators):
-                right = self._eval_node(comp)
-                if left is None or right is None:
-                    return False
-                if isinstance(op, ast.Eq) and not (left == right):
-                    return False
-                if isinstance(op, ast.NotEq) and not (left != right):
-                    return False
-                if isinstance(op, ast.Gt) and not (left > right):
-                    return False
-                if isinstance(op, ast.GtE) and not (left >= right):
-                    return False
-                if isinstance(op, ast.Lt) and not (left < right):
-                    return False
-                if isinstance(op, ast.LtE) and not (left <= right):
-                    return False
-                left = right
-            return True
+            return self._compile_compare(node)
         if isinstance(node, ast.Name):
-            if node.id == "gear":
-                return self.sbc.last_values.get("gear")
-            if node.id == "tuner":
-                return self.sbc.last_values.get("tuner")
-            if node.id == "layer":
-                return self.layer
-            return self.vars.get(node.id)
+            name = node.id
+            sbc = self.sbc
+            if name == "gear" or name == "tuner":
+                return lambda: sbc.last_values.get(name)
+            if name == "layer":
+                return lambda: self.layer
+            return lambda: self.vars.get(name)
         if isinstance(node, ast.Constant):
-            return node.value
+            value = node.value
+            return lambda: value
         if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-            func = node.func.id
-            args = [self._eval_node(a) for a in node.args]
-            if func == "pressed" and args:
-                return self.sbc.get_button_state(self.sbc.button_name_to_index.get(args[0], -1))
-            if func == "toggle_on" and args:
-                return self.sbc.get_button_state(self.sbc.button_name_to_index.get(args[0], -1))
-            if func == "logical_on" and args:
-                return self.sbc.get_logical_state(args[0])
-            if func == "led_on" and args:
-                led_id = self.sbc.led_name_to_id.get(args[0])
-                return self.sbc.led_state.get(led_id, 0) > 0 if led_id is not None else False
-            if func == "var" and args:
-                return self.vars.get(args[0])
-            if func == "analog" and args:
-                return self.sbc.last_values.get(args[0])
-            if func == "value" and args:
-                return self.sbc.last_values.get(args[0])
-            if func == "time_ms":
-                return int(time.monotonic() * 1000)
-            if func == "is_set" and args:
-                return args[0] in self.vars and self.vars.get(args[0]) is not None
-            if func == "is_none" and args:
-                return self.vars.get(args[0]) is None
-            if func == "num" and args:
-                try:
-                    return float(args[0])
-                except (TypeError, ValueError):
-                    return None
-        return False
+            return self._compile_call(node.func.id, node.args)
+        return lambda: False
+
+    def _compile_compare(self, node):
+        """Chained comparison where any None operand makes the whole chain false."""
+        left = self._compile_node(node.left)
+        # unlisted operators (in/is/...) are skipped, as the old tree walker did
+        pairs = tuple(
+            (_COMPARE_OPS.get(type(op).__name__), self._compile_node(comp))
+            for op, comp in zip(node.ops, node.comparators)
+        )
+        if len(pairs) == 1 and isinstance(node.comparators[0], ast.Constant):
+            op = pairs[0][0]
+            right = node.comparators[0].value
+            if right is None:
+                return lambda: False
+            if op is None:
+                return lambda: left() is not None
+            return lambda: (value := left()) is not None and op(value, right)
+
+        def compare():
+            lhs = left()
+            for op, right_fn in pairs:
+                rhs = right_fn()
+                if lhs is None or rhs is None:
+                    return False
+                if op is not None and not op(lhs, rhs):
+                    return False
+                lhs = rhs
+            return True
+
+        return compare
+
+    def _compile_call(self, name, args):
+        if name == "time_ms":
+            return lambda: int(time.monotonic() * 1000)
+        lookup = self._expr_lookups.get(name)
+        if lookup is None or not args:
+            return lambda: False
+        if not isinstance(args[0], ast.Constant):
+            arg = self._compile_node(args[0])
+            return lambda: lookup(arg())
+        key = args[0].value
+        sbc = self.sbc
+        if name == "pressed" or name == "toggle_on":
+            index = sbc.button_name_to_index.get(key, -1)
+            get_button_state = sbc.get_button_state
+            return lambda: get_button_state(index)
+        if name == "led_on":
+            led_id = sbc.led_name_to_id.get(key)
+            if led_id is None:
+                return lambda: False
+            return lambda: sbc.led_state.get(led_id, 0) > 0
+        if name == "num":
+            value = _to_num(key)
+            return lambda: value
+        return lambda: lookup(key)
+
+    def _build_expr_lookups(self):
+        """Map expression call names to one-argument runtime lookups."""
+        sbc = self.sbc
+
+        def pressed(key):
+            return sbc.get_button_state(sbc.button_name_to_index.get(key, -1))
+
+        def led_on(key):
+            led_id = sbc.led_name_to_id.get(key)
+            return sbc.led_state.get(led_id, 0) > 0 if led_id is not None else False
+
+        def analog(key):
+            return sbc.last_values.get(key)
+
+        return {
+            "pressed": pressed,
+            "toggle_on": pressed,
+            "logical_on": lambda key: sbc.get_logical_state(key),
+            "led_on": led_on,
+            "var": lambda key: self.vars.get(key),
+            "analog": analog,
+            "value": analog,
+            "is_set": lambda key: self.vars.get(key) is not None,
+            "is_none": lambda key: self.vars.get(key) is None,
+            "num": _to_num,
+        }
 
     def validate_macros(self):
-        """Validate configured macro structures and scripted step schema."""
+        """
+        Validate configured macro structures and scripted step schema.
+
+        Validating `if` steps also compiles their expressions into the
+        expression cache, so the first runtime evaluation is a lookup.
+        """
         errors = []
         for name, macro in self.macros.items():
             if isinstance(macro, list):
@@ -588,21 +1019,38 @@ class MacroEngine:
 
     def reload_config(self, config):
         """Reload runtime macro-related config values without process restart."""
-        self.control_macros = config.get("control_macros", {})
-        self.macros = config.get("macros", {})
-        self.analog_zones = config.get("analog_zones", {})
-        self.gear_zones = config.get("gear_zones", [])
-        self.layer_cycle_button = config.get("layer_cycle_button", "LeftJoySightChange")
+        self._flush_persisted_vars(force=True)
+        self.control_macros = _intern_tree(config.get("control_macros", {}))
+        self.macros = _intern_tree(config.get("macros", {}))
+        self.analog_zones = _intern_tree(config.get("analog_zones", {}))
+        self.gear_zones = _intern_tree(config.get("gear_zones", []))
+        self._axis_zones = {axis: self._compile_analog_zones(zones) for axis, zones in self.analog_zones.items()}
+        self._gear_lookup = self._compile_gear_zones(self.gear_zones)
+        self._gear_value = None
+        self._build_control_table()
+        self.layer_cycle_button = _intern_tree(config.get("layer_cycle_button", "LeftJoySightChange"))
+        self._macro_cache = {}
+        self._macro_slots = {}
         self.layer = 0
         self.persist_enabled = bool(config.get("persist_vars", False))
-        self.persist_names = set(config.get("persist_var_names", []))
+        self.persist_names = set(_intern_tree(config.get("persist_var_names", [])))
         self.persist_path = Path(config.get("persist_var_path", "macro_vars.json"))
         self.sound_enabled = bool(config.get("sound_enabled", True))
         self.sound_base_path = Path(config.get("sound_base_path", "sounds"))
+        self._sound_path_cache = {}
         self.tts_enabled = bool(config.get("tts_enabled", True))
         self.tts_voice = config.get("tts_voice")
-        self.event_log_path = Path(config.get("event_log_path", "sbc_events.log"))
+        log_path = Path(config.get("event_log_path", "sbc_events.log"))
+        if log_path != self.event_log_path:
+            # pending lines belong to the old log; the tracked size and open
+            # handle are only refreshed when the path actually moves
+            self._flush_log(force=True)
+            self._close_log()
+            self.event_log_path = log_path
+            self._log_size = self._stat_log_size()
         self.event_log_max_bytes = int(config.get("event_log_max_bytes", 131072))
+        self.event_flush_ms = int(config.get("event_sink_flush_ms", 250))
+        self.event_flush_max = int(config.get("event_sink_flush_max", 64))
         self._load_persisted_vars()
         self._init_sound()
         self._init_tts()
@@ -615,9 +1063,9 @@ class MacroEngine:
             return
         for name in self.persist_names:
             self.vars.pop(name, None)
+        self._persist_dirty = False
         try:
-            if self.persist_path.exists():
-                self.persist_path.unlink()
+            self.persist_path.unlink(missing_ok=True)
         except OSError:
             pass
 
@@ -628,27 +1076,7 @@ class MacroEngine:
             if not isinstance(step, dict):
                 errors.append(f"{macro_name}[{idx}]: step must be object")
                 continue
-            allowed = {
-                "if",
-                "then",
-                "else",
-                "sleep_ms",
-                "set_layer",
-                "cycle_layer",
-                "set_var",
-                "run_macro",
-                "press",
-                "down",
-                "up",
-                "led_set",
-                "led_blink",
-                "led_breathe",
-                "sound_play",
-                "tts_say",
-                "queue_button",
-                "queue_macro",
-            }
-            unknown = set(step.keys()) - allowed
+            unknown = [key for key in step if key not in _ALLOWED_STEP_KEYS]
             if unknown:
                 errors.append(f"{macro_name}[{idx}]: unknown keys {sorted(unknown)}")
             if "if" in step:
@@ -676,26 +1104,12 @@ class MacroEngine:
         return errors
 
     def _validate_expr(self, expr):
-        try:
-            tree = ast.parse(expr, mode="eval")
-        except SyntaxError:
-            return False
-        return self._validate_expr_tree(tree.body)
+        code = self._expr_cache.get(expr, _MISSING)
+        if code is _MISSING:
+            code = self._compile_expr(expr)
+        return code is not None
 
     def _validate_expr_tree(self, node):
-        allowed_calls = {
-            "pressed",
-            "toggle_on",
-            "logical_on",
-            "led_on",
-            "var",
-            "analog",
-            "value",
-            "time_ms",
-            "is_set",
-            "is_none",
-            "num",
-        }
         if isinstance(node, ast.BoolOp):
             return all(self._validate_expr_tree(v) for v in node.values)
         if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
@@ -707,7 +1121,7 @@ class MacroEngine:
         if isinstance(node, ast.Constant):
             return True
         if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-            if node.func.id not in allowed_calls:
+            if node.func.id not in _ALLOWED_CALLS:
                 return False
             return all(self._validate_expr_tree(a) for a in node.args)
         return False
@@ -716,26 +1130,46 @@ class MacroEngine:
         """Load configured persisted variables from disk."""
         if not self.persist_enabled or not self.persist_names:
             return
-        if not self.persist_path.exists():
-            return
+        # a missing file is just another OSError; no separate exists() stat
         try:
-            data = json.loads(self.persist_path.read_text())
-        except (OSError, json.JSONDecodeError):
+            data = _loads_vars(self.persist_path.read_bytes())
+        except (OSError, ValueError):
             return
         for name in self.persist_names:
             if name in data:
                 self.vars[name] = data[name]
 
+    def _flush_persisted_vars(self, force=False):
+        """Write pending var changes, at most once per `PERSIST_FLUSH_INTERVAL_S` unless forced."""
+        if not self._persist_dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._persist_last_flush < self.PERSIST_FLUSH_INTERVAL_S:
+            return
+        self._persist_dirty = False
+        self._persist_last_flush = now
+        self._save_persisted_vars()
+
     def _save_persisted_vars(self):
-        """Persist configured variable subset to disk."""
+        """Persist configured variable subset to disk (atomically, via a temp file)."""
         if not self.persist_enabled or not self.persist_names:
             return
         payload = {name: self.vars.get(name) for name in self.persist_names}
+        tmp_path = self.persist_path.with_name(self.persist_path.name + ".tmp")
         try:
-            self.persist_path.write_text(json.dumps(payload, indent=2))
+            tmp_path.write_bytes(_dumps_vars(payload))
+            os.replace(tmp_path, self.persist_path)
         except OSError:
             pass
 
+    def close(self):
+        """Flush buffered events, pending persisted vars and log lines; close the log and TTS pipe."""
+        self.flush_events()
+        self._flush_persisted_vars(force=True)
+        self._flush_log(force=True)
+        self._close_log()
+        self._post_audio_control(self._stop_espeak)
+
     def run_macro(self, name):
         """Run one macro by name, handling key or scripted definitions."""
         if not name:
@@ -749,22 +1183,52 @@ class MacroEngine:
             self._run_tap(macro)
 
     def _publish_event(self, payload):
-        """Publish macro runtime events to optional external sink."""
-        if self.event_sink is not None:
-            try:
-                self.event_sink.publish(payload)
-            except Exception:
-                pass
+        """
+        Queue macro runtime event for the optional external sink.
+
+        Events are stamped now and sent in batches: when the buffer reaches
+        `event_sink_flush_max` entries, when its oldest entry is older than
+        `event_sink_flush_ms`, or at the end of `tick()`.
+        """
+        if self.event_sink is None:
+            return
+        payload.setdefault("timestamp_ms", int(time.time() * 1000))
+        now = time.monotonic()
+        buf = self._event_buf
+        if not buf:
+            self._event_flush_at = now + self.event_flush_ms / 1000.0
+        buf.append(payload)
+        if len(buf) >= self.event_flush_max or now >= self._event_flush_at:
+            self.flush_events()
+
+    def flush_events(self):
+        """Send buffered events to the sink, one batch when it supports it."""
+        buf = self._event_buf
+        if not buf:
+            return
+        self._event_buf = []
+        try:
+            publish_batch = getattr(self.event_sink, "publish_batch", None)
+            if publish_batch is not None:
+                publish_batch(buf)
+            else:
+                for payload in buf:
+                    self.event_sink.publish(payload)
+        except Exception:
+            pass
 
     def _format_text(self, text):
         """Expand `{var:name}` placeholders from current macro variable state."""
         if "{var:" not in text:
             return text
-        out = text
-        for key, value in self.vars.items():
-            token = "{var:" + str(key) + "}"
-            out = out.replace(token, "" if value is None else str(value))
-        return out
+        return _VAR_TOKEN_RE.sub(self._expand_var_token, text)
+
+    def _expand_var_token(self, match):
+        # unknown names keep their placeholder, as before
+        value = self.vars.get(match.group(1), _MISSING)
+        if value is _MISSING:
+            return match.group(0)
+        return "" if value is None else str(value)
 
     def _init_sound(self):
         """Initialize pygame mixer backend if sound output is enabled."""
@@ -783,38 +1247,54 @@ class MacroEngine:
             self._sound_backend = None
 
     def _sound_play(self, file_name):
-        """Play configured sound file or emit visual/log fallback on failure."""
+        """Queue configured sound file for playback, or emit visual/log fallback."""
         if self._sound_backend is None:
             if self.ui is not None:
                 self.ui.set_status("Sound backend unavailable")
             self._visual_fallback("Sound backend unavailable")
             self._log_event(f"sound_backend_unavailable:{file_name}")
             return
-        path = Path(file_name)
-        if not path.is_absolute():
-            path = self.sound_base_path / file_name
+        path = self._sound_path_cache.get(file_name)
+        if path is None:
+            path = Path(file_name)
+            if not path.is_absolute():
+                path = self.sound_base_path / file_name
+            path = self._sound_path_cache[file_name] = str(path)
+        self._submit_audio(self._do_sound_play, path)
+
+    def _do_sound_play(self, path):
         try:
-            self._sound_backend.Sound(str(path)).play()
+            self._sound_backend.Sound(path).play()
         except Exception:
-            if self.ui is not None:
-                self.ui.set_status(f"Sound error: {path}")
-            self._visual_fallback(f"Sound error: {path}")
-            self._log_event(f"sound_error:{path}")
+            self._audio_errors.put((f"Sound error: {path}", f"sound_error:{path}"))
 
     def _init_tts(self):
-        """Initialize TTS backend preference order: pyttsx3, then espeak."""
-        if not self.tts_enabled:
-            self._tts_backend = None
-            return
+        """Have the audio worker reset its TTS backend before the next utterance."""
+        # espeak argv for the current voice, built per config rather than per start
+        voice = ("-v", self.tts_voice) if self.tts_voice else ()
+        self._post_audio_control(self._reset_tts, self.tts_voice, (self._espeak, *voice, "--stdin"))
+
+    def _reset_tts(self, voice, espeak_argv):
+        # audio worker only; the backend is re-picked on the next utterance
+        self._tts_backend = None
+        self._tts_ready = False
+        self._tts_voice = voice
+        self._espeak_argv = espeak_argv
+
+    def _load_tts_backend(self):
+        """Pick TTS backend in preference order: pyttsx3, then espeak (audio worker only)."""
+        # a reload may have changed the voice the running espeak was started with
+        self._stop_espeak()
         try:
             import pyttsx3
         except Exception:
             pyttsx3 = None
         if pyttsx3 is not None:
             try:
+                # pyttsx3 engines are not thread-safe, so this one lives on the worker
                 engine = pyttsx3.init()
-                if self.tts_voice:
-                    engine.setProperty("voice", self.tts_voice)
+                if self._tts_voice:
+                    engine.setProperty("voice", self._tts_voice)
                 self._tts_backend = ("pyttsx3", engine)
                 return
             except Exception:
@@ -822,14 +1302,17 @@ class MacroEngine:
         self._tts_backend = ("espeak", None)
 
     def _tts_say(self, text):
-        """Speak text via active TTS backend, with visual/log fallback on errors."""
+        """Queue text for the active TTS backend; returns without waiting for speech."""
         if not self.tts_enabled:
             return
+        self._submit_audio(self._do_tts_say, text)
+
+    def _do_tts_say(self, text):
+        if not self._tts_ready:
+            self._tts_ready = True
+            self._load_tts_backend()
         if self._tts_backend is None:
-            if self.ui is not None:
-                self.ui.set_status("TTS backend unavailable")
-            self._visual_fallback("TTS backend unavailable")
-            self._log_event("tts_backend_unavailable")
+            self._audio_errors.put(("TTS backend unavailable", "tts_backend_unavailable"))
             return
         backend, engine = self._tts_backend
         if backend == "pyttsx3":
@@ -837,42 +1320,230 @@ class MacroEngine:
                 engine.say(text)
                 engine.runAndWait()
             except Exception:
-                if self.ui is not None:
-                    self.ui.set_status("TTS error")
-                self._visual_fallback("TTS error")
-                self._log_event("tts_error")
+                self._audio_errors.put(("TTS error", "tts_error"))
         else:
-            cmd = ["espeak", text]
-            if self.tts_voice:
-                cmd = ["espeak", "-v", self.tts_voice, text]
+            # one utterance per line on the pipe, so no process spawn per call
+            line = (text.replace("\n", " ") + "\n").encode("utf-8")
             try:
-                subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                proc = self._espeak_proc
+                if proc is None or proc.poll() is not None:
+                    proc = self._espeak_proc = self._start_espeak()
+                proc.stdin.write(line)
+                proc.stdin.flush()
             except Exception:
-                if self.ui is not None:
-                    self.ui.set_status("TTS error")
-                self._visual_fallback("TTS error")
-                self._log_event("tts_error")
+                self._stop_espeak()
+                self._audio_errors.put(("TTS error", "tts_error"))
+
+    def _start_espeak(self):
+        # our fds are non-inheritable already, so POSIX can skip the close_fds sweep
+        return subprocess.Popen(
+            self._espeak_argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=os.name == "nt",
+            startupinfo=self._espeak_si,
+        )
+
+    def _stop_espeak(self):
+        """Close the espeak pipe; espeak finishes what it was given, then exits."""
+        proc = self._espeak_proc
+        if proc is None:
+            return
+        self._espeak_proc = None
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+
+    def _submit_audio(self, fn, *args):
+        """
+        Hand a blocking audio job to the worker.
+
+        When the queue is backed up, room is made by evicting (in order) a
+        pending worker wake-up, the oldest queued utterance (stale speech is
+        the least useful), or else the oldest job; real jobs lost this way are
+        counted in `audio_drops` and logged.
+        """
+        if self._audio_thread is None:
+            self._audio_thread = threading.Thread(target=self._audio_worker, name="macro-audio", daemon=True)
+            self._audio_thread.start()
+        audio_q = self._audio_q
+        try:
+            audio_q.put_nowait((fn, args))
+            return
+        except queue.Full:
+            pass
+        do_tts_say = self._do_tts_say
+        dropped = None
+        with audio_q.mutex:
+            pending = audio_q.queue
+            # the worker may have taken a job since put_nowait failed
+            if len(pending) >= audio_q.maxsize:
+                victim = 0
+                for idx, job in enumerate(pending):
+                    if job[0] is None:
+                        victim = idx
+                        break
+                    if dropped is None and job[0] == do_tts_say:
+                        dropped = job
+                        victim = idx
+                dropped = pending[victim]
+                del pending[victim]
+        audio_q.put_nowait((fn, args))
+        if dropped is not None and dropped[0] is not None:
+            self.audio_drops += 1
+            kind = "tts" if dropped[0] == do_tts_say else "sound"
+            self._log_event(f"audio_dropped:{kind}")
+
+    def _post_audio_control(self, fn, *args):
+        """Run `fn` on the audio worker before its next job (immediately if it is idle)."""
+        self._audio_ctl.put((fn, args))
+        if self._audio_thread is None:
+            # nothing has run yet; the worker applies it ahead of its first job
+            return
+        try:
+            self._audio_q.put_nowait((None, ()))
+        except queue.Full:
+            # the worker is busy and drains controls before the next job anyway
+            pass
+
+    def _audio_worker(self):
+        ctl = self._audio_ctl
+        while True:
+            fn, args = self._audio_q.get()
+            while not ctl.empty():
+                ctl_fn, ctl_args = ctl.get()
+                ctl_fn(*ctl_args)
+            if fn is not None:
+                fn(*args)
+
+    def _report_audio_errors(self):
+        """Surface audio worker failures on the main thread (UI status, LED cue, log)."""
+        while True:
+            try:
+                status, log_text = self._audio_errors.get_nowait()
+            except queue.Empty:
+                return
+            if self.ui is not None:
+                self.ui.set_status(status)
+            self._visual_fallback(status)
+            self._log_event(log_text)
 
     def _visual_fallback(self, message):
         """Fallback LED cue when audio/TTS action fails."""
         if "Eject" in self.sbc.led_name_to_id:
-            self.led_effects["Eject"] = {
-                "type": "blink",
-                "start": time.monotonic(),
-                "duration_ms": 1500,
-                "period_ms": 300,
-                "on_ms": 150,
-                "intensity": 15,
-            }
+            self._eject_blink["start"] = time.monotonic()
+            self.led_effects["Eject"] = self._eject_blink
 
     def _log_event(self, text):
-        """Append message to bounded rolling event log."""
+        """
+        Append message to bounded rolling event log.
+
+        Lines are buffered in memory and written by `_flush_log`: from `tick()`
+        at most once per `LOG_FLUSH_INTERVAL_S`, as soon as `LOG_FLUSH_BYTES`
+        are pending, and on `close()`. Only the wall-clock time is taken
+        here; timestamps are formatted when the batch is written.
+        """
+        if not self._log_ok:
+            if time.monotonic() < self._log_retry_at:
+                self.log_drops += 1
+                return
+            self._log_ok = True
+        self._log_buf.append((time.time(), text))
+        # "YYYY-MM-DD HH:MM:SS " prefix + newline; exact for ASCII text
+        self._log_bytes += len(text) + 21
+        if self._log_bytes >= self.LOG_FLUSH_BYTES:
+            self._flush_log(force=True)
+
+    def _flush_log(self, force=False):
+        """
+        Append buffered log lines to the event log.
+
+        The file grows by appends only; once it passes twice
+        `event_log_max_bytes` it is rotated down to its last
+        `event_log_max_bytes`, so the trim cost is paid once per that many
+        bytes instead of on every write.
+        """
+        if not self._log_buf:
+            return
+        now = time.monotonic()
+        if not force and now - self._log_last_flush < self.LOG_FLUSH_INTERVAL_S:
+            return
+        entries = self._log_buf
+        pending = self._format_log_lines(entries)
+        self._log_buf = []
+        self._log_bytes = 0
+        self._log_last_flush = now
         try:
-            entry = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {text}\n"
-            existing = b""
-            if self.event_log_path.exists():
-                existing = self.event_log_path.read_bytes()
-            data = (existing + entry.encode("utf-8"))[-self.event_log_max_bytes :]
-            self.event_log_path.write_bytes(data)
+            if self._log_fh is None:
+                # lines are already joined per flush, so no extra stdio buffering
+                self._log_fh = open(self.event_log_path, "ab", buffering=0)
+            self._log_fh.write(pending)
+        except OSError:
+            self._close_log()
+            self._log_write_failed(len(entries))
+            return
+        self._log_size += len(pending)
+        if self._log_size > 2 * self.event_log_max_bytes:
+            self._rotate_log()
+
+    def _log_write_failed(self, lost):
+        """Count a failed batch as dropped and stop buffering until `LOG_RETRY_S` has passed."""
+        self.log_drops += lost
+        if self._log_ok and self.ui is not None:
+            self.ui.set_status("Event log write failed")
+        self._log_ok = False
+        self._log_retry_at = time.monotonic() + self.LOG_RETRY_S
+
+    @staticmethod
+    def _format_log_lines(entries):
+        """Render buffered `(time, text)` entries; one strftime per distinct second."""
+        lines = []
+        last_sec = None
+        prefix = ""
+        for stamp, text in entries:
+            sec = int(stamp)
+            if sec != last_sec:
+                last_sec = sec
+                prefix = time.strftime("%Y-%m-%d %H:%M:%S ", time.localtime(sec))
+            lines.append(f"{prefix}{text}\n")
+        return "".join(lines).encode("utf-8")
+
+    def _rotate_log(self):
+        """Replace the event log with its last `event_log_max_bytes` (atomically, via a temp file)."""
+        # the append handle would keep writing to the replaced inode
+        self._close_log()
+        max_bytes = self.event_log_max_bytes
+        tmp_path = self.event_log_path.with_name(self.event_log_path.name + ".tmp")
+        try:
+            with open(self.event_log_path, "rb") as src, open(tmp_path, "wb") as dst:
+                size = os.fstat(src.fileno()).st_size
+                offset = max(0, size - max_bytes)
+                if size:
+                    # the kept tail goes from the mapped pages straight into the
+                    # new file, without an intermediate bytes copy
+                    with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        with memoryview(mapped) as view:
+                            dst.write(view[offset:])
+            os.replace(tmp_path, self.event_log_path)
+        except (OSError, ValueError):
+            self._log_size = self._stat_log_size()
+            return
+        self._log_size = size - offset
+
+    def _close_log(self):
+        fh = self._log_fh
+        if fh is None:
+            return
+        self._log_fh = None
+        try:
+            fh.close()
         except OSError:
             pass
+
+    def _stat_log_size(self):
+        try:
+            return os.stat(self.event_log_path).st_size
+        except OSError:
+            return 0
@@ -11,6 +11,9 @@ Used as an optional event sink for telemetry/state streams so external clients
 can observe controller, macro, and vessel-model activity in near real time.
 """
 
+# json.dumps builds a fresh encoder whenever separators are passed; share one.
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
 
 class _ClientHandler(socketserver.BaseRequestHandler):
     """Per-client handler that keeps connection alive until disconnect/stop."""
@@ -48,6 +51,9 @@ class NetworkEventServer:
         self.port = port
         self._clients = set()
         self._lock = threading.Lock()
+        # publishers run on several threads (main loop, input-matrix sink
+        # worker); one sender at a time keeps NDJSON lines from interleaving
+        self._send_lock = threading.Lock()
         self._stopping = False
         self._server = _ThreadedTCPServer((self.host, self.port), _ClientHandler)
         self._server._add_client = self._add_client
@@ -72,22 +78,39 @@ class NetworkEventServer:
         """Broadcast payload to all connected clients."""
         payload = dict(payload)
         payload.setdefault("timestamp_ms", int(time.time() * 1000))
-        data = (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+        self._broadcast((_encode(payload) + "\n").encode("utf-8"))
+
+    def publish_batch(self, payloads):
+        """Broadcast several payloads with one send per client."""
+        if not payloads:
+            return
+        now_ms = int(time.time() * 1000)
+        lines = []
+        for payload in payloads:
+            if "timestamp_ms" not in payload:
+                payload = dict(payload, timestamp_ms=now_ms)
+            lines.append(_encode(payload))
+        lines.append("")
+        self._broadcast("\n".join(lines).encode("utf-8"))
+
+    def _broadcast(self, data):
         with self._lock:
             clients = list(self._clients)
-        for client in clients:
+        with self._send_lock:
+            for client in clients:
+                try:
+                    client.sendall(data)
+                except OSError:
+                    self._remove_client(client)
+
+    def _send_to(self, client, payload):
+        data = (_encode(payload) + "\n").encode("utf-8")
+        with self._send_lock:
             try:
                 client.sendall(data)
             except OSError:
                 self._remove_client(client)
 
-    def _send_to(self, client, payload):
-        data = (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
-        try:
-            client.sendall(data)
-        except OSError:
-            self._remove_client(client)
-
     def _add_client(self, client):
         with self._lock:
             self._clients.add(client)
@@ -93,6 +93,7 @@ def main():
     sbc.open()
     macro_engine = None
     vessel_model = None
+    gear_effects = None
     ui = None
 
     def reload_callback(vars_only=False, clear_vars=False):
@@ -112,6 +113,8 @@ def main():
             macro_engine.reload_config(eff)
         if vessel_model is not None:
             vessel_model.reload_config(eff)
+        if gear_effects is not None:
+            gear_effects.reconfigure(eff)
         if ui is not None:
             ui.config_root = cfg
             ui.config_view = eff
@@ -185,6 +188,19 @@ def main():
         macro_engine.run_macro(effective.get("powerup_macro", ""))
         send_interval = 0.0
         last_send = 0.0
+
+        def dispatch_queued(queued):
+            event_type = queued.get("type")
+            if event_type == "button":
+                macro_engine.handle_button_event(
+                    queued.get("control"),
+                    bool(queued.get("pressed")),
+                    changed=True,
+                    default_led_mode=led_mode,
+                )
+            elif event_type == "macro":
+                macro_engine.run_macro(queued.get("macro"))
+
         if isinstance(net_config, dict) and event_server is not None:
             send_interval = max(0.0, float(net_config.get("send_interval_ms", 0)) / 1000.0)
         while True:
@@ -211,17 +227,7 @@ def main():
             macro_engine.handle_gears(state)
 
             # Drain queued synthetic events so automation behaves like user input.
-            for queued in input_matrix.drain():
-                event_type = queued.get("type")
-                if event_type == "button":
-                    macro_engine.handle_button_event(
-                        queued.get("control"),
-                        bool(queued.get("pressed")),
-                        changed=True,
-                        default_led_mode=led_mode,
-                    )
-                elif event_type == "macro":
-                    macro_engine.run_macro(queued.get("macro"))
+            input_matrix.drain_into(dispatch_queued)
 
             # Publish periodic raw-state telemetry if network server is active.
             if event_server is not None and send_interval >= 0:
@@ -265,6 +271,8 @@ def main():
                     ui.teardown()
                 if touch is not None:
                     touch.close()
+                macro_engine.close()
+                input_matrix.close()
                 if event_server is not None:
                     event_server.stop()
                 return
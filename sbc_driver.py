@@ -370,6 +370,24 @@ class SBCDriver:
         if send:
             self.write_leds()
 
+    def set_leds(self, changes, send=True):
+        """Set several `(led_id, intensity)` nibbles, then flush once if requested."""
+        data = self.raw_led_data
+        led_state = self.led_state
+        for led_id, intensity in changes:
+            if led_id in self.LED_ID_UNUSED or led_id < self.LED_ID_MIN or led_id > self.LED_ID_MAX:
+                continue
+            capped = self._clamp_intensity(intensity)
+            byte_pos = led_id >> 1
+            if led_id & 1:
+                data[byte_pos] = (data[byte_pos] & 0x0F) | (capped << 4)
+            else:
+                data[byte_pos] = (data[byte_pos] & 0xF0) | capped
+            led_state[led_id] = capped
+
+        if send:
+            self.write_leds()
+
     def set_all_leds(self, intensity, send=True):
         """Set all valid LEDs to the same intensity."""
         for led_id in range(self.LED_ID_MIN, self.LED_ID_MAX + 1):